@@ -1 +1,2 @@
-from .crud import expenses, users  # noqa: F401
+# Kept free of imports: the password hashing processes (app.hashing) are
+# spawned and import this package, and must not build engines or pools.
@@ -5,6 +5,7 @@ from alembic import context
 from dotenv import load_dotenv
 from sqlalchemy import engine_from_config, pool
 
+from app import models  # noqa: F401  (registers the tables on Base)
 from app.database import Base
 
 config = context.config
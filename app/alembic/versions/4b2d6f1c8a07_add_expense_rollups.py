@@ -0,0 +1,60 @@
+"""Add expense_rollups and backfill it from expenses
+
+Revision ID: 4b2d6f1c8a07
+Revises: e7948f9969b9
+Create Date: 2026-10-17 14:03:22.118604
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4b2d6f1c8a07"
+down_revision: str | Sequence[str] | None = "e7948f9969b9"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Bucket expressions per dialect, matching crud.rollups.bucket_for.
+BUCKETS = {
+    "postgresql": {
+        "day": "CAST(created_at AS DATE)",
+        "month": "CAST(date_trunc('month', created_at) AS DATE)",
+    },
+    "sqlite": {
+        "day": "date(created_at)",
+        "month": "date(created_at, 'start of month')",
+    },
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "expense_rollups",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("granularity", sa.String(length=5), nullable=False),
+        sa.Column("bucket", sa.Date(), nullable=False),
+        sa.Column("total", sa.Float(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id", "granularity", "bucket"),
+    )
+
+    buckets = BUCKETS[op.get_bind().dialect.name]
+    for granularity, bucket in buckets.items():
+        op.execute(
+            "INSERT INTO expense_rollups "
+            "(user_id, granularity, bucket, total, count) "
+            f"SELECT user_id, '{granularity}', {bucket}, "
+            "COALESCE(SUM(amount), 0), COUNT(*) FROM expenses "
+            "WHERE user_id IS NOT NULL AND created_at IS NOT NULL "
+            f"GROUP BY user_id, {bucket}"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("expense_rollups")
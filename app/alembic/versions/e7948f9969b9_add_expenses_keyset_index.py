@@ -0,0 +1,74 @@
+"""Add (user_id, created_at, id) index for keyset pagination
+
+Revision ID: e7948f9969b9
+Revises: 1c1a63a38b71
+Create Date: 2026-10-17 09:12:40.514220
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e7948f9969b9"
+down_revision: str | Sequence[str] | None = "1c1a63a38b71"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _restore_tables() -> None:
+    # 1c1a63a38b71 was autogenerated while the models were bound to a
+    # separate declarative Base, so it dropped both tables and running
+    # databases only have them through Base.metadata.create_all(). Recreate
+    # them here when missing so the index below always has a table.
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("username", sa.String(), nullable=True),
+            sa.Column("hashed_password", sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(op.f("ix_users_id"), "users", ["id"], unique=False)
+        op.create_index(
+            op.f("ix_users_username"), "users", ["username"], unique=True
+        )
+    if not inspector.has_table("expenses"):
+        op.create_table(
+            "expenses",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("description", sa.String(), nullable=True),
+            sa.Column("amount", sa.Float(), nullable=True),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            op.f("ix_expenses_description"),
+            "expenses",
+            ["description"],
+            unique=False,
+        )
+        op.create_index(
+            op.f("ix_expenses_id"), "expenses", ["id"], unique=False
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _restore_tables()
+    op.create_index(
+        "ix_expenses_user_id_created_at_id",
+        "expenses",
+        ["user_id", "created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_expenses_user_id_created_at_id", table_name="expenses")
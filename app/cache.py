@@ -1,10 +1,245 @@
-import json
+import asyncio
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
 from typing import Any
 
 import redis
+import redis.asyncio as aioredis
 from fastapi import Depends
 
-from app.database import get_redis
+from app import serialization
+from app.database import get_async_redis, get_redis
+from app.metrics import (
+    cache_errors_total,
+    cache_invalidations_total,
+    cache_lookups_total,
+)
+
+DEFAULT_NAMESPACE = "expenses"
+
+# Optional in-process (L1) cache in front of Redis, one per worker.
+CACHE_L1_ENABLED = os.getenv("CACHE_L1_ENABLED", "false").lower() == "true"
+CACHE_L1_MAX_ITEMS = int(os.getenv("CACHE_L1_MAX_ITEMS", "10000"))
+CACHE_L1_TTL = float(os.getenv("CACHE_L1_TTL", "30"))
+
+# Pub/sub channel carrying the generation keys bumped by clear_user_cache.
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Keep cached lists up to date on writes instead of invalidating them.
+CACHE_WRITE_THROUGH = (
+    os.getenv("CACHE_WRITE_THROUGH", "false").lower() == "true"
+)
+
+# Stampede protection for entries rebuilt by get_or_build_raw. Entries
+# outlive their fresh TTL by CACHE_STALE_SECONDS, during which they are
+# still served while one request refreshes them in the background. A miss
+# is rebuilt by one request per key: concurrent requests in a worker share
+# its result, and other workers wait up to CACHE_LOCK_WAIT_MS on a Redis
+# lock held for at most CACHE_LOCK_TTL_MS.
+CACHE_STALE_SECONDS = int(os.getenv("CACHE_STALE_SECONDS", "60"))
+CACHE_LOCK_TTL_MS = int(os.getenv("CACHE_LOCK_TTL_MS", "5000"))
+CACHE_LOCK_WAIT_MS = int(os.getenv("CACHE_LOCK_WAIT_MS", "2000"))
+CACHE_LOCK_POLL_MS = 20
+
+# Field present in every filled list hash, so an empty list is still a hit.
+LIST_MARKER = b""
+
+# KEYS: list hash, list version. ARGV: version read before the database
+# query, TTL, then field/value pairs. Skips the fill when a write has
+# bumped the version since, as the rows read may already be stale.
+_FILL_LIST = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], '', '')
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# KEYS: list hash, list version. ARGV: operation, then field/value pairs
+# (fields only for "remove"). Always bumps the version and only patches a
+# list that is cached.
+_PATCH_LIST = """
+redis.call('INCR', KEYS[2])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local op = ARGV[1]
+if op == 'remove' then
+    for i = 2, #ARGV do
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+elseif op == 'drop' then
+    redis.call('DEL', KEYS[1])
+else
+    for i = 2, #ARGV, 2 do
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+return 1
+"""
+
+# KEYS: lock. ARGV: token. Only the holder may release a lock, so one that
+# expired and was taken over is not released by its previous holder.
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def generation_key(user_id: int, namespace: str = DEFAULT_NAMESPACE) -> str:
+    """Redis key holding the current cache generation of a user.
+
+    Generation keys never expire: they are a few bytes per user, and
+    letting one lapse would reset the counter and resurrect entries from an
+    older generation that are still within their TTL.
+    """
+    return f"gen:{namespace}:{user_id}"
+
+
+def versioned_key(
+    user_id: int, generation: int, *parts, namespace: str = DEFAULT_NAMESPACE
+) -> str:
+    """Build a cache key bound to one generation of a user's data."""
+    return ":".join(
+        [namespace, str(user_id), f"v{generation}", *map(str, parts)]
+    )
+
+
+def list_key(user_id: int, namespace: str = DEFAULT_NAMESPACE) -> str:
+    """Hash holding a user's write-through list, one field per item."""
+    return f"list:{namespace}:{user_id}"
+
+
+def list_version_key(user_id: int, namespace: str = DEFAULT_NAMESPACE) -> str:
+    """Counter bumped by every patch of a user's write-through list.
+
+    Like generation keys it never expires.
+    """
+    return f"listver:{namespace}:{user_id}"
+
+
+def lock_key(key: str) -> str:
+    """Redis lock held while ``key`` is being rebuilt."""
+    return f"lock:{key}"
+
+
+def raw_local_key(key: str) -> str:
+    """LocalCache key under which the raw bytes of ``key`` are kept.
+
+    Kept apart from ``key`` itself, which holds the deserialized value.
+    """
+    return f"{key}#raw"
+
+
+class LocalCache:
+    """Bounded LRU mapping whose entries also expire after ``ttl`` seconds.
+
+    Values are stored as-is (already deserialized), so a hit costs a dict
+    lookup. The lock keeps it safe for the sync CacheManager, which runs in
+    threadpool workers.
+    """
+
+    def __init__(self, max_items: int, ttl: float):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+local_cache = (
+    LocalCache(CACHE_L1_MAX_ITEMS, CACHE_L1_TTL) if CACHE_L1_ENABLED else None
+)
+
+# Rebuilds running in this worker, by cache key.
+_rebuilds: dict[str, asyncio.Task] = {}
+
+
+async def listen_for_invalidations(
+    redis_client: aioredis.Redis, local: LocalCache, poll_seconds: float = 1.0
+) -> None:
+    """Evict generation keys bumped by any worker from ``local``.
+
+    Only generation keys need evicting: data keys embed the generation, so
+    once a worker re-reads it, entries of the old generation are never
+    looked up again and age out of the LRU. Messages are polled every
+    ``poll_seconds``, which also lets the client send its health-check
+    PINGs, so an idle channel never raises. When the subscription is lost,
+    ``local`` is cleared once it is re-established, covering messages
+    missed in between; anything else is bounded by CACHE_L1_TTL.
+    """
+    resubscribed = False
+    while True:
+        try:
+            async with redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                if resubscribed:
+                    local.clear()
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=poll_seconds
+                    )
+                    if message is not None and message["type"] == "message":
+                        key = message["data"]
+                        local.delete(
+                            key.decode() if isinstance(key, bytes) else key
+                        )
+        except redis.RedisError as e:
+            print(f"Redis invalidation listener error: {e}")
+            cache_errors_total.inc("listen")
+            local.clear()
+            resubscribed = True
+            await asyncio.sleep(1)
+
+
+def _decode_lookup(value: bytes | None) -> Any | None:
+    """Deserialize one value read from Redis, counting the hit or miss."""
+    if not value:
+        cache_lookups_total.inc("redis", "miss")
+        return None
+    cache_lookups_total.inc("redis", "hit")
+    return serialization.loads(value)
 
 
 class CacheManager:
@@ -16,20 +251,47 @@ class CacheManager:
         try:
             cached_data = self.redis.get(key)
             if cached_data:
-                return json.loads(cached_data)
+                cache_lookups_total.inc("redis", "hit")
+                return serialization.loads(cached_data)
+            cache_lookups_total.inc("redis", "miss")
             return None
         except redis.RedisError as e:
             print(f"Redis get error: {e}")
+            cache_lookups_total.inc("redis", "error")
             return None
 
     def set(self, key: str, value: Any, expire_seconds: int = 300) -> bool:
         """Store data in cache with an optional expiration time (in seconds)."""
         try:
-            serialized_value = json.dumps(value)
+            serialized_value = serialization.dumps(value)
             self.redis.setex(key, expire_seconds, serialized_value)
             return True
         except redis.RedisError as e:
             print(f"Redis set error: {e}")
+            cache_errors_total.inc("set")
+            return False
+
+    def get_raw(self, key: str) -> bytes | None:
+        """Retrieve the stored JSON bytes of a key without parsing them."""
+        try:
+            data = self.redis.get(key)
+            cache_lookups_total.inc("redis", "hit" if data else "miss")
+            return data
+        except redis.RedisError as e:
+            print(f"Redis get error: {e}")
+            cache_lookups_total.inc("redis", "error")
+            return None
+
+    def set_raw(
+        self, key: str, data: bytes, expire_seconds: int = 300
+    ) -> bool:
+        """Store already-encoded JSON bytes under a key."""
+        try:
+            self.redis.setex(key, expire_seconds, data)
+            return True
+        except redis.RedisError as e:
+            print(f"Redis set error: {e}")
+            cache_errors_total.inc("set")
             return False
 
     def delete(self, key: str) -> bool:
@@ -39,22 +301,618 @@ class CacheManager:
             return True
         except redis.RedisError as e:
             print(f"Redis delete error: {e}")
+            cache_errors_total.inc("delete")
+            return False
+
+    def get_many(self, keys: list[str]) -> list[Any | None]:
+        """Retrieve several keys with one MGET, None for each miss."""
+        if not keys:
+            return []
+        try:
+            values = self.redis.mget(keys)
+        except redis.RedisError as e:
+            print(f"Redis get error: {e}")
+            cache_lookups_total.inc("redis", "error", amount=len(keys))
+            return [None] * len(keys)
+        return [_decode_lookup(value) for value in values]
+
+    def set_many(
+        self,
+        items: dict[str, Any],
+        expire_seconds: int = 300,
+        ttls: dict[str, int] | None = None,
+    ) -> bool:
+        """Store several values in one pipelined round trip.
+
+        Each key expires after ``ttls[key]`` seconds when given, otherwise
+        after ``expire_seconds``.
+        """
+        if not items:
+            return True
+        ttls = ttls or {}
+        try:
+            with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.setex(
+                        key,
+                        ttls.get(key, expire_seconds),
+                        serialization.dumps(value),
+                    )
+                pipe.execute()
+            return True
+        except redis.RedisError as e:
+            print(f"Redis set error: {e}")
+            cache_errors_total.inc("set_many")
+            return False
+
+    def delete_many(self, keys: Iterable[str]) -> bool:
+        """Delete several keys with one DEL."""
+        keys = list(keys)
+        if not keys:
+            return True
+        try:
+            self.redis.delete(*keys)
+            return True
+        except redis.RedisError as e:
+            print(f"Redis delete error: {e}")
+            cache_errors_total.inc("delete_many")
+            return False
+
+    def generation(
+        self, user_id: int, namespace: str = DEFAULT_NAMESPACE
+    ) -> int | None:
+        """Return the user's current cache generation, None if unreadable."""
+        try:
+            return int(
+                self.redis.get(generation_key(user_id, namespace)) or 0
+            )
+        except redis.RedisError as e:
+            print(f"Redis generation error: {e}")
+            cache_errors_total.inc("generation")
+            return None
+
+    def user_key(
+        self, user_id: int, *parts, namespace: str = DEFAULT_NAMESPACE
+    ) -> str | None:
+        """Return the key for ``parts`` under the user's current generation.
+
+        Returns None when the generation cannot be read, in which case the
+        caller should bypass the cache rather than guess a generation.
+        """
+        generation = self.generation(user_id, namespace)
+        if generation is None:
+            return None
+        return versioned_key(user_id, generation, *parts, namespace=namespace)
+
+    def clear_user_cache(
+        self, user_id: int, namespace: str = DEFAULT_NAMESPACE
+    ) -> bool:
+        """Invalidate all cache entries of a user by bumping its generation.
+
+        Entries of older generations become unreachable and expire through
+        their TTL, so this is a single INCR regardless of keyspace size.
+        """
+        key = generation_key(user_id, namespace)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.incr(key)
+            pipe.publish(INVALIDATION_CHANNEL, key)
+            pipe.execute()
+            cache_invalidations_total.inc(namespace)
+            return True
+        except redis.RedisError as e:
+            print(f"Redis clear cache error: {e}")
+            cache_errors_total.inc("clear")
             return False
 
-    def clear_user_cache(self, user_id: int) -> bool:
-        """Clear all cache entries related to a specific user."""
+
+class AsyncCacheManager:
+    """asyncio counterpart of CacheManager backed by the shared Redis pool.
+
+    Async routes use it to reach Redis without going through the
+    threadpool; all instances share ``database.async_redis_pool``. When a
+    ``local`` cache is given, it is consulted before Redis and filled from
+    it, and generations are evicted from it over pub/sub.
+    """
+
+    def __init__(
+        self, redis_client: aioredis.Redis, local: LocalCache | None = None
+    ):
+        self.redis = redis_client
+        self.local = local
+        # Generations read ahead by generations(), each kept for one
+        # later generation() call.
+        self._prefetched: dict[str, int] = {}
+
+    async def get(self, key: str) -> Any | None:
+        """Retrieve data from cache by key."""
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                cache_lookups_total.inc("local", "hit")
+                return value
+            cache_lookups_total.inc("local", "miss")
         try:
-            cursor = 0
-            pattern = f"expenses:{user_id}*"
-            while True:
-                cursor, keys = self.redis.scan(
-                    cursor=cursor, match=pattern, count=100
+            cached_data = await self.redis.get(key)
+            if cached_data:
+                cache_lookups_total.inc("redis", "hit")
+                value = serialization.loads(cached_data)
+                if self.local is not None:
+                    self.local.set(key, value)
+                return value
+            cache_lookups_total.inc("redis", "miss")
+            return None
+        except redis.RedisError as e:
+            print(f"Redis get error: {e}")
+            cache_lookups_total.inc("redis", "error")
+            return None
+
+    async def set(
+        self, key: str, value: Any, expire_seconds: int = 300
+    ) -> bool:
+        """Store data in cache with an optional expiration time (in seconds)."""
+        if self.local is not None:
+            self.local.set(key, value, expire_seconds)
+        try:
+            serialized_value = serialization.dumps(value)
+            await self.redis.setex(key, expire_seconds, serialized_value)
+            return True
+        except redis.RedisError as e:
+            print(f"Redis set error: {e}")
+            cache_errors_total.inc("set")
+            return False
+
+    async def get_raw(self, key: str) -> bytes | None:
+        """Retrieve the stored JSON bytes of a key without parsing them.
+
+        Lets routes return cached payloads as-is instead of decoding them
+        and having FastAPI validate and re-encode the result.
+        """
+        if self.local is not None:
+            data = self.local.get(raw_local_key(key))
+            if data is not None:
+                cache_lookups_total.inc("local", "hit")
+                return data
+            cache_lookups_total.inc("local", "miss")
+        try:
+            data = await self.redis.get(key)
+            cache_lookups_total.inc("redis", "hit" if data else "miss")
+            if data and self.local is not None:
+                self.local.set(raw_local_key(key), data)
+            return data
+        except redis.RedisError as e:
+            print(f"Redis get error: {e}")
+            cache_lookups_total.inc("redis", "error")
+            return None
+
+    async def set_raw(
+        self, key: str, data: bytes, expire_seconds: int = 300
+    ) -> bool:
+        """Store already-encoded JSON bytes under a key."""
+        if self.local is not None:
+            self.local.set(raw_local_key(key), data, expire_seconds)
+        try:
+            await self.redis.setex(key, expire_seconds, data)
+            return True
+        except redis.RedisError as e:
+            print(f"Redis set error: {e}")
+            cache_errors_total.inc("set")
+            return False
+
+    async def get_or_build_raw(
+        self,
+        key: str,
+        build: Callable[[], Awaitable[bytes]],
+        expire_seconds: int = 300,
+        stale_seconds: int = CACHE_STALE_SECONDS,
+    ) -> bytes:
+        """Return the bytes cached under ``key``, rebuilding them once.
+
+        Entries are fresh for ``expire_seconds`` and then served stale for
+        up to ``stale_seconds`` more while a background task rebuilds them.
+        On a miss only one caller per key runs ``build``: others in this
+        worker await the same task, and other workers wait for its result
+        behind a Redis lock. ``build`` must open its own database session,
+        as it may outlive the request that started it.
+        """
+        if self.local is not None:
+            data = self.local.get(raw_local_key(key))
+            if data is not None:
+                cache_lookups_total.inc("local", "hit")
+                return data
+            cache_lookups_total.inc("local", "miss")
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.pttl(key)
+                data, ttl_ms = await pipe.execute()
+        except redis.RedisError as e:
+            print(f"Redis get error: {e}")
+            cache_lookups_total.inc("redis", "error")
+            data = None
+        if data:
+            if 0 <= ttl_ms < stale_seconds * 1000:
+                cache_lookups_total.inc("redis", "stale")
+                self._rebuild(
+                    key, build, expire_seconds, stale_seconds, False
+                )
+                return data
+            cache_lookups_total.inc("redis", "hit")
+            if self.local is not None:
+                self.local.set(raw_local_key(key), data)
+            return data
+        cache_lookups_total.inc("redis", "miss")
+        task = self._rebuild(key, build, expire_seconds, stale_seconds, True)
+        # Shielded so that one caller going away does not cancel the
+        # rebuild the others are waiting for.
+        data = await asyncio.shield(task)
+        # None only when joining a background refresh that another worker
+        # was already running.
+        return data if data is not None else await build()
+
+    def _rebuild(
+        self, key, build, expire_seconds, stale_seconds, wait
+    ) -> asyncio.Task:
+        task = _rebuilds.get(key)
+        if (
+            task is None
+            or task.done()
+            or task.get_loop() is not asyncio.get_running_loop()
+        ):
+            task = asyncio.create_task(
+                self._locked_rebuild(
+                    key, build, expire_seconds, stale_seconds, wait
+                )
+            )
+            _rebuilds[key] = task
+            task.add_done_callback(
+                lambda done: (
+                    _rebuilds.pop(key, None)
+                    if _rebuilds.get(key) is done
+                    else None
+                )
+            )
+        return task
+
+    async def _locked_rebuild(
+        self, key, build, expire_seconds, stale_seconds, wait
+    ) -> bytes | None:
+        lock, token = lock_key(key), secrets.token_hex(8)
+        try:
+            held = bool(
+                await self.redis.set(
+                    lock, token, nx=True, px=CACHE_LOCK_TTL_MS
+                )
+            )
+        except redis.RedisError as e:
+            print(f"Redis lock error: {e}")
+            cache_errors_total.inc("lock")
+            held = None  # Unknown: rebuild without a lock.
+        if held is False:
+            if not wait:
+                return None
+            data = await self._wait_for_rebuild(key, lock)
+            if data is not None:
+                return data
+        try:
+            data = await build()
+        except Exception as e:
+            if wait:
+                raise
+            print(f"Cache refresh error: {e}")
+            return None
+        finally:
+            if held:
+                try:
+                    await self.redis.eval(_RELEASE_LOCK, 1, lock, token)
+                except redis.RedisError as e:
+                    print(f"Redis unlock error: {e}")
+        await self.set_raw(key, data, expire_seconds + stale_seconds)
+        return data
+
+    async def _wait_for_rebuild(self, key: str, lock: str) -> bytes | None:
+        """Poll for the entry another worker is rebuilding.
+
+        Returns None on timeout, or when the lock goes away without an
+        entry (its holder failed), so the caller rebuilds it itself.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + CACHE_LOCK_WAIT_MS / 1000
+        while loop.time() < deadline:
+            await asyncio.sleep(CACHE_LOCK_POLL_MS / 1000)
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.get(key)
+                    pipe.exists(lock)
+                    data, locked = await pipe.execute()
+            except redis.RedisError as e:
+                print(f"Redis get error: {e}")
+                return None
+            if data or not locked:
+                return data
+        return None
+
+    async def delete(self, key: str) -> bool:
+        """Delete data from cache by key."""
+        if self.local is not None:
+            self.local.delete(key)
+            self.local.delete(raw_local_key(key))
+        try:
+            await self.redis.delete(key)
+            return True
+        except redis.RedisError as e:
+            print(f"Redis delete error: {e}")
+            cache_errors_total.inc("delete")
+            return False
+
+    async def get_many(self, keys: list[str]) -> list[Any | None]:
+        """Retrieve several keys in one round trip, None for each miss.
+
+        Keys found in the local cache are not sent to Redis; the rest are
+        read with a single MGET.
+        """
+        values: list[Any | None] = [None] * len(keys)
+        remote = []
+        for index, key in enumerate(keys):
+            value = self.local.get(key) if self.local is not None else None
+            if value is not None:
+                cache_lookups_total.inc("local", "hit")
+                values[index] = value
+            else:
+                if self.local is not None:
+                    cache_lookups_total.inc("local", "miss")
+                remote.append(index)
+        if not remote:
+            return values
+        try:
+            found = await self.redis.mget([keys[i] for i in remote])
+        except redis.RedisError as e:
+            print(f"Redis get error: {e}")
+            cache_lookups_total.inc("redis", "error", amount=len(remote))
+            return values
+        for index, data in zip(remote, found, strict=True):
+            value = _decode_lookup(data)
+            if value is not None and self.local is not None:
+                self.local.set(keys[index], value)
+            values[index] = value
+        return values
+
+    async def set_many(
+        self,
+        items: dict[str, Any],
+        expire_seconds: int = 300,
+        ttls: dict[str, int] | None = None,
+    ) -> bool:
+        """Store several values in one pipelined round trip.
+
+        Each key expires after ``ttls[key]`` seconds when given, otherwise
+        after ``expire_seconds``.
+        """
+        if not items:
+            return True
+        ttls = ttls or {}
+        if self.local is not None:
+            for key, value in items.items():
+                self.local.set(key, value, ttls.get(key, expire_seconds))
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.setex(
+                        key,
+                        ttls.get(key, expire_seconds),
+                        serialization.dumps(value),
+                    )
+                await pipe.execute()
+            return True
+        except redis.RedisError as e:
+            print(f"Redis set error: {e}")
+            cache_errors_total.inc("set_many")
+            return False
+
+    async def delete_many(self, keys: Iterable[str]) -> bool:
+        """Delete several keys with one DEL."""
+        keys = list(keys)
+        if not keys:
+            return True
+        if self.local is not None:
+            for key in keys:
+                self.local.delete(key)
+                self.local.delete(raw_local_key(key))
+        try:
+            await self.redis.delete(*keys)
+            return True
+        except redis.RedisError as e:
+            print(f"Redis delete error: {e}")
+            cache_errors_total.inc("delete_many")
+            return False
+
+    async def generation(
+        self, user_id: int, namespace: str = DEFAULT_NAMESPACE
+    ) -> int | None:
+        """Return the user's current cache generation, None if unreadable."""
+        key = generation_key(user_id, namespace)
+        if key in self._prefetched:
+            return self._prefetched.pop(key)
+        generations = await self._read_generations(user_id, (namespace,))
+        return generations[namespace] if generations is not None else None
+
+    async def generations(
+        self, user_id: int, *namespaces: str
+    ) -> dict[str, int] | None:
+        """Return the user's generations in several namespaces at once.
+
+        They are read with one MGET (minus those in the local cache), and
+        the next generation() call for each namespace reuses the value
+        instead of reading it again. None if they cannot be read.
+        """
+        generations = await self._read_generations(user_id, namespaces)
+        if generations is not None:
+            for namespace, generation in generations.items():
+                self._prefetched[generation_key(user_id, namespace)] = (
+                    generation
+                )
+        return generations
+
+    async def _read_generations(
+        self, user_id: int, namespaces: tuple[str, ...]
+    ) -> dict[str, int] | None:
+        keys = {ns: generation_key(user_id, ns) for ns in namespaces}
+        generations = {}
+        if self.local is not None:
+            for namespace, key in keys.items():
+                generation = self.local.get(key)
+                if generation is not None:
+                    generations[namespace] = generation
+        missing = [ns for ns in namespaces if ns not in generations]
+        if missing:
+            try:
+                values = await self.redis.mget([keys[ns] for ns in missing])
+            except redis.RedisError as e:
+                print(f"Redis generation error: {e}")
+                cache_errors_total.inc("generation")
+                return None
+            for namespace, value in zip(missing, values, strict=True):
+                generations[namespace] = int(value or 0)
+                if self.local is not None:
+                    self.local.set(keys[namespace], generations[namespace])
+        return generations
+
+    async def user_key(
+        self, user_id: int, *parts, namespace: str = DEFAULT_NAMESPACE
+    ) -> str | None:
+        """Return the key for ``parts`` under the user's current generation.
+
+        Returns None when the generation cannot be read.
+        """
+        generation = await self.generation(user_id, namespace)
+        if generation is None:
+            return None
+        return versioned_key(user_id, generation, *parts, namespace=namespace)
+
+    async def get_list(
+        self, user_id: int, namespace: str = DEFAULT_NAMESPACE
+    ) -> bytes | None:
+        """Return a user's write-through list as a JSON array, or None.
+
+        Fields sort in list order and their values are the items' JSON, so
+        the array is assembled without decoding anything.
+        """
+        try:
+            items = await self.redis.hgetall(list_key(user_id, namespace))
+        except redis.RedisError as e:
+            print(f"Redis get error: {e}")
+            cache_lookups_total.inc("redis", "error")
+            return None
+        if not items:
+            cache_lookups_total.inc("redis", "miss")
+            return None
+        cache_lookups_total.inc("redis", "hit")
+        items.pop(LIST_MARKER, None)
+        return b"[" + b",".join(v for _, v in sorted(items.items())) + b"]"
+
+    async def list_version(
+        self, user_id: int, namespace: str = DEFAULT_NAMESPACE
+    ) -> str | None:
+        """Read before loading a list to fill; None if unreadable."""
+        try:
+            version = await self.redis.get(
+                list_version_key(user_id, namespace)
+            )
+        except redis.RedisError as e:
+            print(f"Redis get error: {e}")
+            cache_errors_total.inc("list_version")
+            return None
+        return version.decode() if version else "0"
+
+    async def fill_list(
+        self,
+        user_id: int,
+        version: str,
+        items: list[tuple[str, bytes]],
+        expire_seconds: int = 300,
+        namespace: str = DEFAULT_NAMESPACE,
+    ) -> bool:
+        """Cache a freshly loaded list unless a write raced with the load.
+
+        ``items`` are (sort field, item JSON) pairs; ``version`` is what
+        list_version returned before the rows were read.
+        """
+        args = [version, expire_seconds]
+        for field, value in items:
+            args += [field, value]
+        try:
+            return bool(
+                await self.redis.eval(
+                    _FILL_LIST,
+                    2,
+                    list_key(user_id, namespace),
+                    list_version_key(user_id, namespace),
+                    *args,
                 )
-                if keys:
-                    self.redis.delete(*keys)
-                if cursor == 0:
-                    break
+            )
+        except redis.RedisError as e:
+            print(f"Redis set error: {e}")
+            cache_errors_total.inc("fill_list")
+            return False
+
+    async def patch_list(
+        self,
+        user_id: int,
+        op: str,
+        *args,
+        namespace: str = DEFAULT_NAMESPACE,
+    ) -> bool:
+        """Apply a write to a user's cached list in one atomic step.
+
+        ``op`` is "add" followed by field/value pairs, "remove" followed
+        by fields, or "drop" to discard the list. There is no in-place
+        replace: patches carry no row version, so two updates of one
+        expense could land in the opposite order to their commits. When
+        the patch cannot be applied the list is deleted instead, so a
+        failed patch costs a miss rather than a stale read.
+        """
+        keys = (
+            list_key(user_id, namespace),
+            list_version_key(user_id, namespace),
+        )
+        try:
+            await self.redis.eval(_PATCH_LIST, 2, *keys, op, *args)
+            return True
+        except redis.RedisError as e:
+            print(f"Redis patch error: {e}")
+            cache_errors_total.inc("patch_list")
+        try:
+            await self.redis.delete(keys[0])
+        except redis.RedisError as e:
+            print(f"Redis delete error: {e}")
+        return False
+
+    async def clear_user_cache(
+        self, user_id: int, namespace: str = DEFAULT_NAMESPACE
+    ) -> bool:
+        """Invalidate all cache entries of a user by bumping its generation.
+
+        The bumped key is published so every worker drops it from its local
+        cache; this worker drops it right away.
+        """
+        key = generation_key(user_id, namespace)
+        self._prefetched.pop(key, None)
+        if self.local is not None:
+            self.local.delete(key)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.incr(key)
+                pipe.publish(INVALIDATION_CHANNEL, key)
+                await pipe.execute()
+            cache_invalidations_total.inc(namespace)
             return True
         except redis.RedisError as e:
             print(f"Redis clear cache error: {e}")
+            cache_errors_total.inc("clear")
             return False
+
+
+async def get_async_cache(
+    redis_client: aioredis.Redis = Depends(get_async_redis),
+) -> AsyncCacheManager:
+    return AsyncCacheManager(redis_client, local_cache)
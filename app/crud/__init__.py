@@ -0,0 +1 @@
+from . import expenses, rollups, users  # noqa: F401
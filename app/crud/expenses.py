@@ -1,47 +1,364 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import delete, insert, null, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..models import Expense
 from ..schemas import ExpenseCreate, ExpenseUpdate
+from . import rollups
+
+
+def _expenses_query(user_id: int):
+    return (
+        select(Expense)
+        .where(Expense.user_id == user_id)
+        .order_by(Expense.created_at, Expense.id)
+    )
+
+
+def _expenses_page_query(
+    user_id: int, limit: int, after: tuple[datetime, int] | None
+):
+    # Served by ix_expenses_user_id_created_at_id: the row-value comparison
+    # seeks straight to the cursor, so a page costs the same at any depth.
+    # One extra row is fetched to know whether another page follows.
+    stmt = _expenses_query(user_id).limit(limit + 1)
+    if after is not None:
+        stmt = stmt.where(
+            tuple_(Expense.created_at, Expense.id) > tuple_(*after)
+        )
+    return stmt
+
+
+def _split_page(rows, limit: int):
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], (last.created_at, last.id)
+
+
+def _bulk_insert_query(returning=Expense.id):
+    # Executed with a list of parameter sets, this becomes batched
+    # multi-row INSERT ... VALUES ... RETURNING statements
+    # ("insertmanyvalues"), with rows returned in input order.
+    return insert(Expense).returning(returning, sort_by_parameter_order=True)
+
+
+def _batch_rows(entries: list[tuple[ExpenseCreate, int]]):
+    # created_at is set here rather than by the column default so the
+    # rollup deltas can be computed without reading the rows back.
+    created_at = datetime.now(ZoneInfo("UTC")).replace(tzinfo=None)
+    return [
+        {**expense.model_dump(), "user_id": user_id, "created_at": created_at}
+        for expense, user_id in entries
+    ]
+
+
+def _bulk_rows(expenses: list[ExpenseCreate], user_id: int):
+    return _batch_rows([(expense, user_id) for expense in expenses])
+
+
+def _bulk_deltas(rows: list[dict]):
+    return [
+        delta
+        for row in rows
+        for delta in rollups.expense_deltas(
+            row["user_id"], row["created_at"], row["amount"], 1
+        )
+    ]
+
+
+def _added(expense: Expense):
+    return rollups.expense_deltas(
+        expense.user_id, expense.created_at, expense.amount, 1
+    )
+
+
+def _removed(expense: Expense):
+    return rollups.expense_deltas(
+        expense.user_id, expense.created_at, -(expense.amount or 0.0), -1
+    )
+
+
+def _amount_changed(
+    expense: Expense, old_amount: float | None, update_data: dict
+):
+    if "amount" not in update_data:
+        return []
+    return rollups.expense_deltas(
+        expense.user_id,
+        expense.created_at,
+        (expense.amount or 0.0) - (old_amount or 0.0),
+        0,
+    )
+
+
+def _apply_update(expense: Expense, update_data: dict):
+    """Apply ``update_data`` to a loaded ``expense``; return its old amount."""
+    old_amount = expense.amount
+    for key, value in update_data.items():
+        setattr(expense, key, value)
+    return old_amount
+
+
+def _expense_query(expense_id: int, user_id: int):
+    return select(Expense).where(
+        Expense.id == expense_id, Expense.user_id == user_id
+    )
+
+
+def _locked_expense_query(expense_id: int, user_id: int):
+    # Writes lock the row they read so concurrent edits of one expense
+    # apply their rollup deltas against the amount they actually replace.
+    return _expense_query(expense_id, user_id).with_for_update()
+
+
+# The writes below are single statements using RETURNING. Dialects without
+# it (dialect.insert_returning etc. is False) fall back to the locked
+# SELECT followed by an ORM flush.
+
+
+def _insert_returning_query(expense: ExpenseCreate, user_id: int):
+    return (
+        insert(Expense)
+        .values(**expense.model_dump(), user_id=user_id)
+        .returning(Expense)
+    )
+
+
+def _update_returning_query(
+    dialect, expense_id: int, user_id: int, values: dict
+):
+    """UPDATE ... RETURNING (new row, replaced amount), or None.
+
+    None means ``dialect`` cannot do it in one statement. The replaced
+    amount is only needed (and only returned) when ``values`` sets it.
+    """
+    stmt = (
+        update(Expense)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if "amount" not in values:
+        if not dialect.update_returning:
+            return None
+        return stmt.where(
+            Expense.id == expense_id, Expense.user_id == user_id
+        ).returning(Expense, null())
+    # SQLite reports update_returning_multifrom, but its RETURNING clause
+    # cannot reference the FROM tables.
+    if not dialect.update_returning_multifrom or dialect.name == "sqlite":
+        return None
+    # The FROM subquery sees the row as it was before this UPDATE, so the
+    # replaced amount comes back with the new row for the rollup delta.
+    old = (
+        select(Expense.id, Expense.amount.label("old_amount"))
+        .where(Expense.id == expense_id, Expense.user_id == user_id)
+        .with_for_update()
+        .subquery()
+    )
+    return stmt.where(
+        Expense.id == old.c.id, Expense.user_id == user_id
+    ).returning(Expense, old.c.old_amount)
+
+
+def _delete_returning_query(expense_id: int, user_id: int):
+    return (
+        delete(Expense)
+        .where(Expense.id == expense_id, Expense.user_id == user_id)
+        .returning(
+            Expense.id, Expense.user_id, Expense.created_at, Expense.amount
+        )
+    )
 
 
 def create_expense(db: Session, expense: ExpenseCreate, user_id: int):
-    db_expense = Expense(**expense.model_dump(), user_id=user_id)
-    db.add(db_expense)
+    if db.get_bind().dialect.insert_returning:
+        db_expense = db.scalars(
+            _insert_returning_query(expense, user_id)
+        ).one()
+    else:
+        db_expense = Expense(**expense.model_dump(), user_id=user_id)
+        db.add(db_expense)
+        db.flush()
+    rollups.apply_deltas(db, _added(db_expense))
     db.commit()
-    db.refresh(db_expense)
     return db_expense
 
 
 def get_expenses(db: Session, user_id: int):
-    return db.query(Expense).filter(Expense.user_id == user_id).all()
+    return db.scalars(_expenses_query(user_id)).all()
 
 
 def get_expense(db: Session, expense_id: int, user_id: int):
-    return (
-        db.query(Expense)
-        .filter(Expense.id == expense_id, Expense.user_id == user_id)
-        .first()
-    )
+    return db.scalars(_expense_query(expense_id, user_id)).first()
 
 
 def update_expense(
     db: Session, expense_id: int, expense: ExpenseUpdate, user_id: int
 ):
-    db_expense = get_expense(db, expense_id, user_id)
-    if not db_expense:
-        return None
-
     update_data = expense.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_expense, key, value)
+    if not update_data:
+        return get_expense(db, expense_id, user_id)
+
+    stmt = _update_returning_query(
+        db.get_bind().dialect, expense_id, user_id, update_data
+    )
+    if stmt is not None:
+        row = db.execute(stmt).first()
+        if row is None:
+            return None
+        db_expense, old_amount = row
+    else:
+        db_expense = db.scalars(
+            _locked_expense_query(expense_id, user_id)
+        ).first()
+        if db_expense is None:
+            return None
+        old_amount = _apply_update(db_expense, update_data)
 
+    rollups.apply_deltas(
+        db, _amount_changed(db_expense, old_amount, update_data)
+    )
     db.commit()
-    db.refresh(db_expense)
     return db_expense
 
 
 def delete_expense(db: Session, expense_id: int, user_id: int):
-    db_expense = get_expense(db, expense_id, user_id)
-    if db_expense:
-        db.delete(db_expense)
-        db.commit()
+    """Delete an expense and return its id, user_id, created_at and amount.
+
+    Returns None if the user has no such expense.
+    """
+    if db.get_bind().dialect.delete_returning:
+        deleted = db.execute(
+            _delete_returning_query(expense_id, user_id)
+        ).first()
+    else:
+        deleted = db.scalars(
+            _locked_expense_query(expense_id, user_id)
+        ).first()
+        if deleted is not None:
+            db.delete(deleted)
+    if deleted is None:
+        return None
+    rollups.apply_deltas(db, _removed(deleted))
+    db.commit()
+    return deleted
+
+
+async def create_expense_async(
+    db: AsyncSession, expense: ExpenseCreate, user_id: int
+):
+    if db.get_bind().dialect.insert_returning:
+        db_expense = (
+            await db.scalars(_insert_returning_query(expense, user_id))
+        ).one()
+    else:
+        db_expense = Expense(**expense.model_dump(), user_id=user_id)
+        db.add(db_expense)
+        await db.flush()
+    await rollups.apply_deltas_async(db, _added(db_expense))
+    await db.commit()
+    return db_expense
+
+
+async def create_expenses_bulk_async(
+    db: AsyncSession, expenses: list[ExpenseCreate], user_id: int
+) -> list[int]:
+    rows = _bulk_rows(expenses, user_id)
+    ids = (await db.scalars(_bulk_insert_query(), rows)).all()
+    await rollups.apply_deltas_async(db, _bulk_deltas(rows))
+    await db.commit()
+    return list(ids)
+
+
+async def create_expenses_batch_async(
+    db: AsyncSession, entries: list[tuple[ExpenseCreate, int]]
+) -> list[Expense]:
+    rows = _batch_rows(entries)
+    expenses = (await db.scalars(_bulk_insert_query(Expense), rows)).all()
+    await rollups.apply_deltas_async(db, _bulk_deltas(rows))
+    await db.commit()
+    return list(expenses)
+
+
+async def get_expenses_async(db: AsyncSession, user_id: int):
+    return (await db.scalars(_expenses_query(user_id))).all()
+
+
+async def get_expenses_page_async(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    after: tuple[datetime, int] | None = None,
+):
+    rows = (
+        await db.scalars(_expenses_page_query(user_id, limit, after))
+    ).all()
+    return _split_page(rows, limit)
+
+
+async def stream_expenses_async(
+    db: AsyncSession, user_id: int, batch_size: int = 1000
+):
+    result = await db.stream_scalars(
+        _expenses_query(user_id).execution_options(yield_per=batch_size)
+    )
+    async for partition in result.partitions():
+        yield partition
+
+
+async def get_expense_async(db: AsyncSession, expense_id: int, user_id: int):
+    return (await db.scalars(_expense_query(expense_id, user_id))).first()
+
+
+async def update_expense_async(
+    db: AsyncSession, expense_id: int, expense: ExpenseUpdate, user_id: int
+):
+    update_data = expense.model_dump(exclude_unset=True)
+    if not update_data:
+        return await get_expense_async(db, expense_id, user_id)
+
+    stmt = _update_returning_query(
+        db.get_bind().dialect, expense_id, user_id, update_data
+    )
+    if stmt is not None:
+        row = (await db.execute(stmt)).first()
+        if row is None:
+            return None
+        db_expense, old_amount = row
+    else:
+        db_expense = (
+            await db.scalars(_locked_expense_query(expense_id, user_id))
+        ).first()
+        if db_expense is None:
+            return None
+        old_amount = _apply_update(db_expense, update_data)
+
+    await rollups.apply_deltas_async(
+        db, _amount_changed(db_expense, old_amount, update_data)
+    )
+    await db.commit()
+    return db_expense
+
+
+async def delete_expense_async(
+    db: AsyncSession, expense_id: int, user_id: int
+):
+    if db.get_bind().dialect.delete_returning:
+        deleted = (
+            await db.execute(_delete_returning_query(expense_id, user_id))
+        ).first()
+    else:
+        deleted = (
+            await db.scalars(_locked_expense_query(expense_id, user_id))
+        ).first()
+        if deleted is not None:
+            await db.delete(deleted)
+    if deleted is None:
+        return None
+    await rollups.apply_deltas_async(db, _removed(deleted))
+    await db.commit()
+    return deleted
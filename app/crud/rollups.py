@@ -0,0 +1,114 @@
+from datetime import date, datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models import ExpenseRollup
+
+GRANULARITIES = ("day", "month")
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def bucket_for(created_at: datetime, granularity: str) -> date:
+    """Return the first day of the day/month bucket ``created_at`` is in."""
+    if granularity == "month":
+        return date(created_at.year, created_at.month, 1)
+    return created_at.date()
+
+
+def expense_deltas(
+    user_id: int,
+    created_at: datetime | None,
+    amount: float | None,
+    count: int,
+) -> list[dict]:
+    """Rollup changes of adding (count=1) or removing (count=-1) an expense.
+
+    Pass count=0 with the amount difference for an edited amount.
+    """
+    if created_at is None:
+        return []
+    return [
+        {
+            "user_id": user_id,
+            "granularity": granularity,
+            "bucket": bucket_for(created_at, granularity),
+            "total": amount or 0.0,
+            "count": count,
+        }
+        for granularity in GRANULARITIES
+    ]
+
+
+def _merge_deltas(deltas: list[dict]) -> list[dict]:
+    # One row per bucket: a single upsert statement may not touch the same
+    # row twice (PostgreSQL rejects it), and it keeps bulk inserts to a
+    # statement of at most a few rows. Sorted, so concurrent transactions
+    # lock the rows in the same order and cannot deadlock each other.
+    merged: dict[tuple, dict] = {}
+    for delta in deltas:
+        key = (delta["user_id"], delta["granularity"], delta["bucket"])
+        if key in merged:
+            merged[key]["total"] += delta["total"]
+            merged[key]["count"] += delta["count"]
+        else:
+            merged[key] = dict(delta)
+    return [merged[key] for key in sorted(merged)]
+
+
+def _upsert_query(dialect_name: str, rows: list[dict]):
+    try:
+        insert = _INSERTS[dialect_name]
+    except KeyError:
+        raise NotImplementedError(
+            f"Expense rollups are not supported on {dialect_name}"
+        ) from None
+    stmt = insert(ExpenseRollup).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[
+            ExpenseRollup.user_id,
+            ExpenseRollup.granularity,
+            ExpenseRollup.bucket,
+        ],
+        set_={
+            "total": ExpenseRollup.total + stmt.excluded.total,
+            "count": ExpenseRollup.count + stmt.excluded.count,
+        },
+    )
+
+
+def _summary_query(user_id: int, granularity: str):
+    return (
+        select(ExpenseRollup)
+        .where(
+            ExpenseRollup.user_id == user_id,
+            ExpenseRollup.granularity == granularity,
+            ExpenseRollup.count > 0,
+        )
+        .order_by(ExpenseRollup.bucket)
+    )
+
+
+def apply_deltas(db: Session, deltas: list[dict]):
+    """Add ``deltas`` to the rollups without committing.
+
+    Callers run this in the transaction of the expense write it mirrors.
+    """
+    if deltas:
+        db.execute(
+            _upsert_query(db.get_bind().dialect.name, _merge_deltas(deltas))
+        )
+
+
+async def apply_deltas_async(db: AsyncSession, deltas: list[dict]):
+    if deltas:
+        await db.execute(
+            _upsert_query(db.get_bind().dialect.name, _merge_deltas(deltas))
+        )
+
+
+async def get_summary_async(db: AsyncSession, user_id: int, granularity: str):
+    return (await db.scalars(_summary_query(user_id, granularity))).all()
@@ -1,18 +1,18 @@
-from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from ..hashing import password_hasher, pwd_context
 from ..models import User
 from ..schemas import UserCreate
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 def get_user(db: Session, user_id: int):
-    return db.query(User).filter(User.id == user_id).first()
+    return db.get(User, user_id)
 
 
 def get_user_by_username(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+    return db.scalars(select(User).where(User.username == username)).first()
 
 
 def create_user(db: Session, user: UserCreate):
@@ -26,3 +26,26 @@ def create_user(db: Session, user: UserCreate):
 
 def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
+
+
+async def get_user_async(db: AsyncSession, user_id: int):
+    return await db.get(User, user_id)
+
+
+async def get_user_by_username_async(db: AsyncSession, username: str):
+    return (
+        await db.scalars(select(User).where(User.username == username))
+    ).first()
+
+
+async def create_user_async(db: AsyncSession, user: UserCreate):
+    hashed_password = await password_hasher.hash(user.password)
+    db_user = User(username=user.username, hashed_password=hashed_password)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await password_hasher.verify(plain_password, hashed_password)
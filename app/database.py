@@ -1,23 +1,159 @@
 import os
 
 import redis
+import redis.asyncio as aioredis
 from dotenv import load_dotenv
+from redis.asyncio.retry import Retry
+from redis.backoff import NoBackoff
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from app.pool import pool_options
+from app.profiling import instrument_engine
+
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# asyncio drivers used when SQLALCHEMY_ASYNC_DATABASE_URL is not set and
+# the async URL has to be derived from the sync one.
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Swap the DBAPI of a sync database URL for its asyncio counterpart."""
+    sync_url = make_url(url)
+    backend = sync_url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(
+            f"No asyncio driver known for {backend!r}; "
+            "set SQLALCHEMY_ASYNC_DATABASE_URL explicitly."
+        )
+    return sync_url.set(
+        drivername=f"{backend}+{ASYNC_DRIVERS[backend]}"
+    ).render_as_string(hide_password=False)
+
+
+SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv(
+    "SQLALCHEMY_ASYNC_DATABASE_URL"
+) or to_async_url(SQLALCHEMY_DATABASE_URL)
+
+# Pool sizing, per engine and per worker process: each process holds up to
+# DB_POOL_SIZE + DB_MAX_OVERFLOW connections in each of the two engines.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+
+
+def _pool_options(url: str) -> dict:
+    return pool_options(
+        url,
+        size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        timeout=DB_POOL_TIMEOUT,
+        recycle=DB_POOL_RECYCLE,
+        pre_ping=DB_POOL_PRE_PING,
+    )
+
+
+# Sync engine: kept as the fallback path for migrations, scripts and any
+# code that still runs in a worker thread.
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, **_pool_options(SQLALCHEMY_DATABASE_URL)
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the request path, so that handlers never occupy a
+# threadpool slot while waiting on the database.
+async_engine = create_async_engine(
+    SQLALCHEMY_ASYNC_DATABASE_URL,
+    **_pool_options(SQLALCHEMY_ASYNC_DATABASE_URL),
+)
+
+# Optional read replica. When set, GET endpoints read from it through
+# dependencies.get_async_read_db; otherwise everything uses the primary.
+SQLALCHEMY_REPLICA_DATABASE_URL = os.getenv("SQLALCHEMY_REPLICA_DATABASE_URL")
+SQLALCHEMY_ASYNC_REPLICA_DATABASE_URL = os.getenv(
+    "SQLALCHEMY_ASYNC_REPLICA_DATABASE_URL"
+) or (
+    to_async_url(SQLALCHEMY_REPLICA_DATABASE_URL)
+    if SQLALCHEMY_REPLICA_DATABASE_URL
+    else None
+)
+
+async_replica_engine = (
+    create_async_engine(
+        SQLALCHEMY_ASYNC_REPLICA_DATABASE_URL,
+        **_pool_options(SQLALCHEMY_ASYNC_REPLICA_DATABASE_URL),
+    )
+    if SQLALCHEMY_ASYNC_REPLICA_DATABASE_URL
+    else None
+)
+
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+if async_replica_engine is not None:
+    instrument_engine(async_replica_engine.sync_engine, "replica")
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+AsyncReplicaSessionLocal = (
+    async_sessionmaker(
+        bind=async_replica_engine, autoflush=False, expire_on_commit=False
+    )
+    if async_replica_engine is not None
+    else None
+)
+
 Base = declarative_base()
 
 REDIS_URL = os.getenv("REDIS_URL")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "1.0"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5"))
+
 redis_client = redis.from_url(REDIS_URL)
 
+# Shared asyncio pool. It blocks for up to REDIS_POOL_TIMEOUT when all
+# REDIS_MAX_CONNECTIONS are checked out instead of opening more, and every
+# command is bounded by REDIS_SOCKET_TIMEOUT so a slow Redis degrades to a
+# cache miss rather than a stuck request.
+async_redis_pool = aioredis.BlockingConnectionPool.from_url(
+    REDIS_URL,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+)
+async_redis_client = aioredis.Redis(connection_pool=async_redis_pool)
+
+# Dedicated client for the cache invalidation subscriber. A subscriber
+# idles between messages, so it has no socket timeout; a dead connection
+# is noticed through TCP keepalive and a PING every
+# REDIS_PUBSUB_HEALTH_CHECK_INTERVAL seconds. Retries are off so that a
+# reconnect, which may have missed messages, always reaches the listener.
+REDIS_PUBSUB_HEALTH_CHECK_INTERVAL = int(
+    os.getenv("REDIS_PUBSUB_HEALTH_CHECK_INTERVAL", "30")
+)
+async_redis_pubsub_client = aioredis.Redis.from_url(
+    REDIS_URL,
+    socket_timeout=None,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+    socket_keepalive=True,
+    health_check_interval=REDIS_PUBSUB_HEALTH_CHECK_INTERVAL,
+    retry=Retry(NoBackoff(), 0),
+)
+
 
 def get_db():
     db = SessionLocal()
@@ -27,8 +163,26 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_async_session_factory():
+    """Session factory for work that outlives the request's dependencies.
+
+    Sessions from get_async_db are closed before a StreamingResponse body
+    is sent, so streaming endpoints open their own from this factory.
+    """
+    return AsyncSessionLocal
+
+
 def get_redis():
     try:
         yield redis_client
     finally:
         pass
+
+
+async def get_async_redis():
+    return async_redis_client
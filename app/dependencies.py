@@ -1,13 +1,23 @@
+import hashlib
 import os
+import secrets
+import time
 from datetime import UTC, datetime, timedelta
 
-from fastapi import Depends, HTTPException, Query, Request, status
+import redis
+import redis.asyncio as aioredis
+from fastapi import Depends, Header, HTTPException, Query, Request, status
 from fastapi.security import HTTPBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from . import crud
-from .database import get_db
+from . import crud, database, schemas
+from .cache import DEFAULT_NAMESPACE, AsyncCacheManager, get_async_cache
+from .database import (
+    get_async_db,
+    get_async_redis,
+    get_async_session_factory,
+)
 from .i18n import get_language, get_translator
 
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -15,6 +25,20 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
+# Verified principals are cached per token for at most this many seconds
+# (and never beyond the token's own expiry).
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "900"))
+PRINCIPAL_NAMESPACE = "principal"
+
+# After a write, the user's reads stay on the primary for this many seconds
+# so they see their own changes despite replica lag. Keep it above the
+# replica's usual lag.
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Shared secret for /internal and /metrics, sent as X-Internal-Token or
+# as a bearer token (for scrapers). When unset the endpoints are disabled.
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
 bearer_scheme = HTTPBearer(auto_error=False)
 
 
@@ -39,10 +63,48 @@ def create_refresh_token(data: dict):
     return encoded_jwt
 
 
-def get_current_user(
+def principal_cache_key(token: str) -> str:
+    return "principal:" + hashlib.sha256(token.encode()).hexdigest()
+
+
+async def invalidate_principals(cache: AsyncCacheManager, user_id: int):
+    """Drop every cached principal of a user; call whenever the user changes.
+
+    Cached entries record the user's principal generation, so bumping it
+    makes all of them stale without knowing which tokens were cached.
+    """
+    return await cache.clear_user_cache(
+        user_id, namespace=PRINCIPAL_NAMESPACE
+    )
+
+
+async def _get_cached_principal(cache: AsyncCacheManager, key: str):
+    entry = await cache.get(key)
+    if entry is None or entry["exp"] <= time.time():
+        return None
+    # The expense routes need the user's expense generation next; reading
+    # both here costs one round trip instead of two.
+    generations = await cache.generations(
+        entry["id"], PRINCIPAL_NAMESPACE, DEFAULT_NAMESPACE
+    )
+    if generations is None:
+        return None
+    if generations[PRINCIPAL_NAMESPACE] != entry["generation"]:
+        return None
+    return schemas.UserOut(id=entry["id"], username=entry["username"])
+
+
+async def get_current_user(
     token: str = Depends(bearer_scheme),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    cache: AsyncCacheManager = Depends(get_async_cache),
 ):
+    """Resolve the bearer token to the authenticated user.
+
+    A cache hit skips both JWT verification and the users-table lookup;
+    the session from get_async_db is never used, so no connection is
+    checked out.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -50,6 +112,10 @@ def get_current_user(
     )
     if not token or not token.credentials:
         raise credentials_exception
+    cache_key = principal_cache_key(token.credentials)
+    principal = await _get_cached_principal(cache, cache_key)
+    if principal is not None:
+        return principal
     try:
         payload = jwt.decode(
             token.credentials, SECRET_KEY, algorithms=[ALGORITHM]
@@ -59,15 +125,115 @@ def get_current_user(
             raise credentials_exception
     except JWTError as e:
         raise credentials_exception from e
-    user = crud.users.get_user(db, user_id=int(user_id))
+    # Read the generation before the row, so that a change committed in
+    # between leaves this entry stale instead of caching the old row.
+    generation = await cache.generation(
+        int(user_id), namespace=PRINCIPAL_NAMESPACE
+    )
+    user = await crud.users.get_user_async(db, user_id=int(user_id))
     if user is None:
         raise credentials_exception
-    return user
+    principal = schemas.UserOut.model_validate(user)
+    expires_at = payload.get("exp") or time.time() + PRINCIPAL_CACHE_TTL
+    ttl = min(PRINCIPAL_CACHE_TTL, int(expires_at - time.time()))
+    if generation is not None and ttl > 0:
+        await cache.set(
+            cache_key,
+            {
+                "id": principal.id,
+                "username": principal.username,
+                "exp": expires_at,
+                "generation": generation,
+            },
+            expire_seconds=ttl,
+        )
+    return principal
+
+
+def recent_write_key(user_id: int) -> str:
+    return f"rw:{user_id}"
+
+
+async def pin_reads_to_primary(
+    current_user: schemas.UserOut = Depends(get_current_user),
+    redis_client: aioredis.Redis = Depends(get_async_redis),
+):
+    """Send the user's reads to the primary for READ_YOUR_WRITES_SECONDS.
+
+    Used as a dependency of write endpoints. It runs before the write, so
+    the window is already open when the write commits.
+    """
+    if database.async_replica_engine is None or READ_YOUR_WRITES_SECONDS <= 0:
+        return
+    try:
+        await redis_client.set(
+            recent_write_key(current_user.id), 1, ex=READ_YOUR_WRITES_SECONDS
+        )
+    except redis.RedisError as e:
+        print(f"Redis read-your-writes error: {e}")
+
 
+async def reads_from_primary(
+    current_user: schemas.UserOut = Depends(get_current_user),
+    redis_client: aioredis.Redis = Depends(get_async_redis),
+) -> bool:
+    """Whether the user's reads must go to the primary.
 
-def get_i18n_translator(
+    True without a replica, within the read-your-writes window, and when
+    Redis cannot tell (a stale read is worse than a busier primary).
+    """
+    if database.async_replica_engine is None:
+        return True
+    try:
+        return bool(
+            await redis_client.exists(recent_write_key(current_user.id))
+        )
+    except redis.RedisError as e:
+        print(f"Redis read-your-writes error: {e}")
+        return True
+
+
+async def get_async_read_db(
+    use_primary: bool = Depends(reads_from_primary),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Session for read-only endpoints: the replica when one may be used.
+
+    The primary session is the one get_current_user already depends on,
+    and sessions only check out a connection when first used.
+    """
+    if use_primary:
+        yield db
+        return
+    async with database.AsyncReplicaSessionLocal() as replica_db:
+        yield replica_db
+
+
+async def get_async_read_session_factory(
+    use_primary: bool = Depends(reads_from_primary),
+    session_factory: async_sessionmaker = Depends(get_async_session_factory),
+) -> async_sessionmaker:
+    """Session factory counterpart of get_async_read_db, for streaming."""
+    if use_primary:
+        return session_factory
+    return database.AsyncReplicaSessionLocal
+
+
+async def get_i18n_translator(
     request: Request,
     lang: str | None = Query(None),
 ):
     language = get_language(request, lang)
     return get_translator(language)
+
+
+async def require_internal_token(
+    x_internal_token: str | None = Header(None),
+    token: str = Depends(bearer_scheme),
+):
+    """Guard operational endpoints that must not be public."""
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    supplied = x_internal_token or (token.credentials if token else "")
+    if not secrets.compare_digest(supplied, INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
@@ -9,3 +9,21 @@ class ExpenseNotFoundError(HTTPException):
             headers={"WWW-Authenticate": "Bearer"},
         )
         self.expense_id = expense_id
+
+
+class InvalidCursorError(HTTPException):
+    def __init__(self, cursor: str, translator):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=translator("invalid_cursor"),
+        )
+        self.cursor = cursor
+
+
+class ServiceBusyError(HTTPException):
+    def __init__(self, retry_after: int, translator):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=translator("service_busy"),
+            headers={"Retry-After": str(retry_after)},
+        )
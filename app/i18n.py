@@ -1,15 +1,39 @@
 import gettext
+from functools import lru_cache
+from pathlib import Path
 
 from fastapi import Query, Request
 
 SUPPORTED_LANGUAGES = ["en", "fa"]
 DEFAULT_LANGUAGE = "en"
+LOCALE_DIR = Path(__file__).parent / "translations"
 
+# Catalogs are parsed once per process and shared by all requests.
+_catalogs: dict[str, gettext.GNUTranslations] = {}
 
-def get_language(request: Request, lang: str | None = Query(None)):
-    if lang and lang in SUPPORTED_LANGUAGES:
-        return lang
-    accept_language = request.headers.get("Accept-Language", DEFAULT_LANGUAGE)
+
+def load_translations() -> dict[str, gettext.GNUTranslations]:
+    """Load every supported catalog that is not loaded yet.
+
+    Called from the app lifespan so the first request does not pay for the
+    .mo parsing; get_translator falls back to it for code running outside
+    the app (scripts, tests).
+    """
+    for lang in SUPPORTED_LANGUAGES:
+        if lang not in _catalogs:
+            _catalogs[lang] = gettext.translation(
+                "messages", localedir=LOCALE_DIR, languages=[lang]
+            )
+    return _catalogs
+
+
+@lru_cache(maxsize=256)
+def parse_accept_language(accept_language: str) -> str:
+    """Map an Accept-Language header to a supported language.
+
+    Clients send a handful of distinct header values, so the parse result
+    is memoized; the cache is bounded so arbitrary headers cannot grow it.
+    """
     for lang_code in accept_language.split(","):
         lang_code = lang_code.split(";")[0].strip().split("-")[0]
         if lang_code in SUPPORTED_LANGUAGES:
@@ -17,11 +41,21 @@ def get_language(request: Request, lang: str | None = Query(None)):
     return DEFAULT_LANGUAGE
 
 
+def get_language(request: Request, lang: str | None = Query(None)):
+    if lang and lang in SUPPORTED_LANGUAGES:
+        return lang
+    return parse_accept_language(
+        request.headers.get("Accept-Language", DEFAULT_LANGUAGE)
+    )
+
+
 def get_translator(lang: str):
+    """Return the gettext callable of a language's shared catalog.
+
+    The bound method only reads the catalog, so it is safe to hand out to
+    concurrent requests; nothing is installed into builtins.
+    """
     if lang not in SUPPORTED_LANGUAGES:
         lang = DEFAULT_LANGUAGE
-    translation = gettext.translation(
-        "messages", localedir="app/translations", languages=[lang]
-    )
-    translation.install()
-    return translation.gettext
+    catalogs = _catalogs if lang in _catalogs else load_translations()
+    return catalogs[lang].gettext
@@ -0,0 +1,135 @@
+import asyncio
+import os
+from contextlib import suppress
+
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import crud, schemas
+from app.database import get_async_session_factory
+from app.metrics import REGISTRY, Histogram
+
+# Opt-in: POST /expenses/ goes through the group-commit queue.
+INGEST_GROUP_COMMIT = (
+    os.getenv("INGEST_GROUP_COMMIT", "false").lower() == "true"
+)
+INGEST_MAX_BATCH = int(os.getenv("INGEST_MAX_BATCH", "500"))
+INGEST_MAX_DELAY_MS = float(os.getenv("INGEST_MAX_DELAY_MS", "5"))
+
+ingest_batch_size = REGISTRY.register(
+    Histogram(
+        "ingest_batch_size",
+        "Expenses committed per group-commit transaction.",
+        buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+    )
+)
+
+
+class GroupCommitQueue:
+    """Batches single-expense inserts into shared transactions.
+
+    Callers wait on submit() until the transaction holding their row has
+    committed, so a response still means the row is durable; what changes
+    is that one COMMIT (and fsync) is paid per batch instead of per
+    request. A batch closes when it reaches ``max_batch`` rows or
+    ``max_delay`` seconds after its first row arrived.
+    """
+
+    def __init__(self, max_batch: int, max_delay: float):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    def _running(self) -> bool:
+        # The worker belongs to the loop that started it; a task left on
+        # a loop that has since closed never completes, so compare loops
+        # rather than relying on done().
+        return (
+            self._task is not None
+            and not self._task.done()
+            and self._task.get_loop() is asyncio.get_running_loop()
+        )
+
+    def ensure_started(self, session_factory: async_sessionmaker):
+        if not self._running():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(session_factory))
+        return self
+
+    async def submit(self, expense: schemas.ExpenseCreate, user_id: int):
+        """Queue one expense and return it once its batch has committed."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((expense, user_id, future))
+        return await future
+
+    async def stop(self):
+        """Commit everything already queued, then stop the worker."""
+        if not self._running():
+            return
+        await self._queue.join()
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(
+                    await asyncio.wait_for(self._queue.get(), timeout)
+                )
+            except TimeoutError:
+                break
+        return batch
+
+    async def _run(self, session_factory: async_sessionmaker):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._commit(session_factory, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit(self, session_factory: async_sessionmaker, batch):
+        try:
+            async with session_factory() as db:
+                expenses = await crud.expenses.create_expenses_batch_async(
+                    db, [(expense, user_id) for expense, user_id, _ in batch]
+                )
+        except Exception as e:
+            if len(batch) > 1:
+                # Retry one by one so a bad row only fails its own request.
+                for item in batch:
+                    await self._commit(session_factory, [item])
+                return
+            _, _, future = batch[0]
+            if not future.done():
+                future.set_exception(e)
+            return
+        ingest_batch_size.observe(len(batch))
+        for (_, _, future), expense in zip(batch, expenses, strict=True):
+            if not future.done():
+                future.set_result(expense)
+
+
+ingest_queue = GroupCommitQueue(INGEST_MAX_BATCH, INGEST_MAX_DELAY_MS / 1000)
+
+
+async def get_ingest_queue(
+    session_factory: async_sessionmaker = Depends(get_async_session_factory),
+) -> GroupCommitQueue | None:
+    """The running group-commit queue, or None when it is disabled."""
+    if not INGEST_GROUP_COMMIT:
+        return None
+    return ingest_queue.ensure_started(session_factory)
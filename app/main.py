@@ -1,12 +1,71 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
 
-from .database import engine
+from . import cache, i18n, startup
+from .database import (
+    async_engine,
+    async_redis_client,
+    async_redis_pool,
+    async_redis_pubsub_client,
+    async_replica_engine,
+)
 from .exceptions import ExpenseNotFoundError
+from .hashing import password_hasher
+from .ingest import ingest_queue
+from .metrics import MetricsMiddleware
 from .models import Base
-from .routers import auth, expenses
+from .profiling import ProfilingMiddleware
+from .routers import auth, expenses, internal
+from .serialization import FastJSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Everything a first request would otherwise pay for happens here,
+    # before the worker accepts traffic.
+    if startup.DB_CREATE_ALL:
+        await startup.create_schema(async_engine, Base.metadata)
+    await asyncio.gather(
+        startup.warm_db_pool(async_engine, startup.STARTUP_DB_CONNECTIONS),
+        startup.warm_redis_pool(
+            async_redis_client, startup.STARTUP_REDIS_CONNECTIONS
+        ),
+        password_hasher.start(),
+    )
+    if async_replica_engine is not None:
+        await startup.warm_db_pool(
+            async_replica_engine, startup.STARTUP_DB_CONNECTIONS
+        )
+    i18n.load_translations()
+    app.openapi()
+    listener = None
+    if cache.local_cache is not None:
+        listener = asyncio.create_task(
+            cache.listen_for_invalidations(
+                async_redis_pubsub_client, cache.local_cache
+            )
+        )
+    yield
+    await ingest_queue.stop()
+    password_hasher.shutdown()
+    if listener is not None:
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+    # Close pooled connections so the worker exits promptly and the
+    # servers see a clean disconnect.
+    await async_engine.dispose()
+    if async_replica_engine is not None:
+        await async_replica_engine.dispose()
+    await async_redis_pool.aclose()
+    await async_redis_pubsub_client.aclose()
+
 
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     title="Expenses API",
     description="A simple API for managing expenses with JWT authentication.",
     version="1.0.0",
@@ -39,13 +98,16 @@ app = FastAPI(
 async def expense_not_found_handler(
     request: Request, exc: ExpenseNotFoundError
 ):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=status.HTTP_404_NOT_FOUND,
         content={"status": "error", "message": exc.detail},
     )
 
 
-Base.metadata.create_all(bind=engine)
-
 app.include_router(auth.router)
 app.include_router(expenses.router)
+app.include_router(internal.router)
+app.include_router(internal.metrics_router)
+
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
@@ -1,10 +1,18 @@
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+)
 
-Base = declarative_base()
+from .database import Base
 
 
 class User(Base):
@@ -20,6 +28,31 @@ class Expense(Base):
     description = Column(String, index=True)
     amount = Column(Float)
     user_id = Column(Integer, ForeignKey("users.id"))
+    # Naive UTC to match the TIMESTAMP WITHOUT TIME ZONE column; asyncpg
+    # rejects timezone-aware values for it.
     created_at = Column(
-        DateTime, default=lambda: datetime.now(ZoneInfo("UTC"))
+        DateTime,
+        default=lambda: datetime.now(ZoneInfo("UTC")).replace(tzinfo=None),
     )
+
+    __table_args__ = (
+        # Keyset pagination of a user's expenses by (created_at, id).
+        Index(
+            "ix_expenses_user_id_created_at_id", "user_id", "created_at", "id"
+        ),
+    )
+
+
+class ExpenseRollup(Base):
+    """Running total and count of a user's expenses per day or month.
+
+    Kept in step with the expenses table by crud.expenses in the same
+    transaction as each write, so summaries never scan the expenses.
+    """
+
+    __tablename__ = "expense_rollups"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    granularity = Column(String(5), primary_key=True)
+    bucket = Column(Date, primary_key=True)
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
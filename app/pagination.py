@@ -0,0 +1,33 @@
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at: datetime, expense_id: int) -> str:
+    """Encode the (created_at, id) keyset position as an opaque token."""
+    raw = json.dumps([created_at.isoformat(), expense_id]).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a token produced by encode_cursor.
+
+    Raises ValueError for anything that is not a well-formed cursor,
+    including one whose timestamp is not naive.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, expense_id = json.loads(
+            base64.urlsafe_b64decode(padded.encode())
+        )
+        created_at = datetime.fromisoformat(created_at)
+        # created_at is stored as naive UTC; comparing it with an aware
+        # value fails on PostgreSQL.
+        if created_at.tzinfo is not None:
+            raise ValueError("cursor timestamp has a time zone")
+        return created_at, int(expense_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
@@ -0,0 +1,135 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStats:
+    """Counters of one connection pool, shared across its recreations."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _record_wait(self, wait: float) -> None:
+        self.wait_seconds_total += wait
+        self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def record_checkout(self, wait: float, overflow: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.overflow_checkouts += overflow
+            self._record_wait(wait)
+
+    def record_timeout(self, wait: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self._record_wait(wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "overflow_checkouts": self.overflow_checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+class _InstrumentedPoolMixin:
+    """Times every checkout of a QueuePool and counts overflow/timeouts.
+
+    Checkout wait is measured around _do_get, which is where QueuePool
+    blocks for up to ``timeout`` when pool_size + max_overflow connections
+    are already in use.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_timeout(time.perf_counter() - start)
+            raise
+        self.stats.record_checkout(
+            time.perf_counter() - start,
+            overflow=self.checkedout() > self.size(),
+        )
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep counting into the
+        # same stats so they cover the life of the engine.
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(
+    _InstrumentedPoolMixin, AsyncAdaptedQueuePool
+):
+    pass
+
+
+def pool_options(
+    url: str,
+    size: int,
+    max_overflow: int,
+    timeout: float,
+    recycle: int,
+    pre_ping: bool,
+) -> dict:
+    """create_engine() pool arguments for ``url``.
+
+    Sizing only applies to dialects whose default pool is a QueuePool
+    (e.g. PostgreSQL, file-based SQLite); others, such as in-memory SQLite,
+    keep their default pool and only get pre_ping.
+    """
+    parsed = make_url(url)
+    default_pool = parsed.get_dialect().get_pool_class(parsed)
+    if issubclass(default_pool, AsyncAdaptedQueuePool):
+        poolclass = InstrumentedAsyncAdaptedQueuePool
+    elif issubclass(default_pool, QueuePool):
+        poolclass = InstrumentedQueuePool
+    else:
+        return {"pool_pre_ping": pre_ping}
+    return {
+        "poolclass": poolclass,
+        "pool_size": size,
+        "max_overflow": max_overflow,
+        "pool_timeout": timeout,
+        "pool_recycle": recycle,
+        "pool_pre_ping": pre_ping,
+    }
+
+
+def pool_status(engine: Engine) -> dict:
+    """Live occupancy of an engine's pool plus its checkout counters."""
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+        )
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.snapshot())
+    return status
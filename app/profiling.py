@@ -0,0 +1,123 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from app.metrics import db_query_duration_seconds, statement_type
+
+DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+# Statements slower than this are logged with their route; 0 disables.
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfile:
+    """SQL statements run on behalf of one request."""
+
+    __slots__ = ("scope", "count", "duration")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.count = 0
+        self.duration = 0.0
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "")
+
+
+# Set per request by ProfilingMiddleware. Engine events read it from the
+# executing task, thread or greenlet, which all inherit the request's
+# context.
+current_profile: ContextVar[QueryProfile | None] = ContextVar(
+    "current_profile", default=None
+)
+
+
+def record_query(statement: str, duration: float) -> None:
+    profile = current_profile.get()
+    if profile is not None:
+        profile.count += 1
+        profile.duration += duration
+    if SLOW_QUERY_THRESHOLD_MS and duration * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s",
+            duration * 1000,
+            profile.route if profile is not None else "-",
+            statement,
+        )
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Time every statement ``engine`` executes.
+
+    Durations feed the db_query_duration_seconds metric, the current
+    request's QueryProfile and the slow-query log.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        db_query_duration_seconds.observe(
+            elapsed, name, statement_type(statement)
+        )
+        record_query(statement, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def _discard(context):
+        # A failed statement never reaches after_cursor_execute.
+        if context.connection is not None:
+            stack = context.connection.info.get("query_start")
+            if stack:
+                stack.pop()
+
+
+def server_timing(profile: QueryProfile, elapsed: float) -> str:
+    return (
+        f'db;dur={profile.duration * 1000:.1f};desc="{profile.count} queries",'
+        f"app;dur={elapsed * 1000:.1f}"
+    )
+
+
+class ProfilingMiddleware:
+    """ASGI middleware collecting a QueryProfile for each HTTP request.
+
+    With ``debug`` on, the totals so far are sent in a Server-Timing header
+    (``db`` for SQL time and statement count, ``app`` for the time until
+    the response started), which browser dev tools display directly.
+    """
+
+    def __init__(self, app, debug: bool = DEBUG):
+        self.app = app
+        self.debug = debug
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        profile = QueryProfile(scope)
+        token = current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if self.debug and message["type"] == "http.response.start":
+                timing = server_timing(profile, time.perf_counter() - start)
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", timing.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
@@ -7,9 +7,11 @@ from fastapi import (
     status,
 )
 from jose import jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import crud, database, dependencies, schemas
+from ..exceptions import ServiceBusyError
+from ..hashing import HashingQueueFullError
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -20,19 +22,22 @@ router = APIRouter(prefix="/auth", tags=["auth"])
     summary="Register a new user",
     description="Create a new user with username and password.",
 )
-def register(
+async def register(
     user: schemas.UserCreate,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     _=Depends(dependencies.get_i18n_translator),
 ):
-    existing_user = crud.users.get_user_by_username(
+    existing_user = await crud.users.get_user_by_username_async(
         db, username=user.username
     )
     if existing_user:
         raise HTTPException(
             status_code=400, detail=_("username_already_registered")
         )
-    return crud.users.create_user(db, user)
+    try:
+        return await crud.users.create_user_async(db, user)
+    except HashingQueueFullError as e:
+        raise ServiceBusyError(retry_after=e.retry_after, translator=_) from e
 
 
 @router.post(
@@ -42,16 +47,22 @@ def register(
     description="Login with username and password to"
     "receive access and refresh tokens in cookies.",
 )
-def login(
+async def login(
     response: Response,
     form_data: schemas.LoginForm,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     _=Depends(dependencies.get_i18n_translator),
 ):
-    user = crud.users.get_user_by_username(db, username=form_data.username)
-    if not user or not crud.users.verify_password(
-        form_data.password, user.hashed_password
-    ):
+    user = await crud.users.get_user_by_username_async(
+        db, username=form_data.username
+    )
+    try:
+        valid = user is not None and await crud.users.verify_password_async(
+            form_data.password, user.hashed_password
+        )
+    except HashingQueueFullError as e:
+        raise ServiceBusyError(retry_after=e.retry_after, translator=_) from e
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=_("incorrect_username_or_password"),
@@ -92,10 +103,10 @@ def login(
     summary="Refresh access token",
     description="Use refresh token.",
 )
-def refresh_token(
+async def refresh_token(
     response: Response,
     refresh_token: str | None = Cookie(None),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     _=Depends(dependencies.get_i18n_translator),
 ):
     credentials_exception = HTTPException(
@@ -120,7 +131,7 @@ def refresh_token(
     except jwt.JWTError as e:
         print(f"JWT decode error: {e}")
         raise credentials_exception from e
-    user = crud.users.get_user(db, user_id=int(user_id))
+    user = await crud.users.get_user_async(db, user_id=int(user_id))
     if user is None:
         print("User not found")
         raise credentials_exception
@@ -158,7 +169,9 @@ def refresh_token(
     summary="Logout user",
     description="Clear access and refresh tokens from cookies.",
 )
-def logout(response: Response, _=Depends(dependencies.get_i18n_translator)):
+async def logout(
+    response: Response, _=Depends(dependencies.get_i18n_translator)
+):
     response.delete_cookie("access_token")
     response.delete_cookie("refresh_token")
     return {"message": _("logged_out_successfully")}
@@ -1,129 +1,475 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+import csv
+import io
+from typing import Literal
 
-from app import crud, database, dependencies, schemas
-from app.cache import CacheManager
-from app.exceptions import ExpenseNotFoundError
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import crud, database, dependencies, pagination, schemas
+from app.cache import (
+    CACHE_WRITE_THROUGH,
+    AsyncCacheManager,
+    get_async_cache,
+    versioned_key,
+)
+from app.exceptions import ExpenseNotFoundError, InvalidCursorError
+from app.ingest import GroupCommitQueue, get_ingest_queue
 
 router = APIRouter(prefix="/expenses", tags=["expenses"])
 
+EXPORT_COLUMNS = ["id", "description", "amount", "created_at"]
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+expense_adapter = TypeAdapter(schemas.ExpenseOut)
+expense_list_adapter = TypeAdapter(list[schemas.ExpenseOut])
+summary_adapter = TypeAdapter(list[schemas.ExpenseSummaryBucket])
+
 
 def serialize_expense(exp):
-    """Convert SQLAlchemy Expense object to JSON-serializable dict."""
+    """Convert SQLAlchemy Expense object to a dict for ExpenseOut.
+
+    created_at stays a datetime; the response encoder writes it directly.
+    """
     return {
         "id": exp.id,
         "description": exp.description,
         "amount": exp.amount,
         "user_id": exp.user_id,
-        "created_at": exp.created_at.isoformat() if exp.created_at else None,
+        "created_at": exp.created_at,
+    }
+
+
+def encode_expense_list(expenses) -> bytes:
+    """Validate ORM rows against ExpenseOut once and encode them to JSON."""
+    return expense_list_adapter.dump_json(
+        expense_list_adapter.validate_python(expenses, from_attributes=True)
+    )
+
+
+def list_field(exp) -> str:
+    """Field of an expense in the write-through list hash.
+
+    Fields sort like (created_at, id), the order of GET /expenses/.
+    """
+    return f"{exp.created_at:%Y-%m-%dT%H:%M:%S.%f}|{exp.id:012d}"
+
+
+def list_item(exp) -> tuple[str, bytes]:
+    return list_field(exp), expense_adapter.dump_json(
+        expense_adapter.validate_python(exp, from_attributes=True)
+    )
+
+
+def json_bytes_response(body: bytes, headers: dict | None = None):
+    """Return already-encoded JSON without FastAPI re-validating it."""
+    return Response(
+        content=body, media_type="application/json", headers=headers
+    )
+
+
+def etag_headers(user_id: int, generation: int | None) -> dict:
+    """Validator headers for a read of the user's expenses.
+
+    The ETag is the user's cache generation, which every write bumps after
+    it commits and after the write-through list is patched, so it changes
+    whenever any of their expenses does. Empty when the generation cannot
+    be read.
+    """
+    if generation is None:
+        return {}
+    return {
+        "ETag": f'W/"{user_id}.{generation}"',
+        # Clients may keep the body but must revalidate before using it.
+        "Cache-Control": "private, no-cache",
     }
 
 
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of ``etag`` against an If-None-Match header."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque
+        for tag in if_none_match.split(",")
+    )
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def encode_ndjson(expenses) -> bytes:
+    return b"".join(
+        schemas.ExpenseOut.model_validate(exp).model_dump_json().encode()
+        + b"\n"
+        for exp in expenses
+    )
+
+
+def encode_csv(expenses, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(
+        [exp.id, exp.description, exp.amount, exp.created_at.isoformat()]
+        for exp in expenses
+    )
+    return buffer.getvalue().encode()
+
+
+async def _export_expenses(
+    session_factory: async_sessionmaker, user_id: int, export_format: str
+):
+    async with session_factory() as db:
+        if export_format == "csv":
+            yield encode_csv([], header=True)
+        encode = encode_csv if export_format == "csv" else encode_ndjson
+        async for expenses in crud.expenses.stream_expenses_async(
+            db=db, user_id=user_id
+        ):
+            yield encode(expenses)
+
+
+async def _get_all_expenses_write_through(
+    session_factory: async_sessionmaker,
+    user_id: int,
+    cache: AsyncCacheManager,
+    headers: dict,
+):
+    cached_body = await cache.get_list(user_id)
+    if cached_body is not None:
+        return json_bytes_response(cached_body, headers)
+
+    version = await cache.list_version(user_id)
+    async with session_factory() as db:
+        expenses = await crud.expenses.get_expenses_async(
+            db=db, user_id=user_id
+        )
+    items = [list_item(exp) for exp in expenses]
+
+    if version is not None:
+        await cache.fill_list(user_id, version, items, expire_seconds=300)
+    return json_bytes_response(
+        b"[" + b",".join(v for _, v in items) + b"]", headers
+    )
+
+
+async def _patch_cached_list(
+    cache: AsyncCacheManager, user_id: int, op: str, *args
+):
+    if CACHE_WRITE_THROUGH:
+        await cache.patch_list(user_id, op, *args)
+
+
+async def _get_all_expenses(
+    session_factory: async_sessionmaker,
+    user_id: int,
+    cache: AsyncCacheManager,
+    generation: int | None,
+    headers: dict,
+):
+    if CACHE_WRITE_THROUGH:
+        return await _get_all_expenses_write_through(
+            session_factory, user_id, cache, headers
+        )
+
+    async def build() -> bytes:
+        async with session_factory() as db:
+            expenses = await crud.expenses.get_expenses_async(
+                db=db, user_id=user_id
+            )
+        return encode_expense_list(expenses)
+
+    if generation is None:
+        return json_bytes_response(await build(), headers)
+    body = await cache.get_or_build_raw(
+        versioned_key(user_id, generation), build, expire_seconds=300
+    )
+    return json_bytes_response(body, headers)
+
+
 @router.post(
     "/",
+    dependencies=[Depends(dependencies.pin_reads_to_primary)],
     response_model=schemas.ExpenseOut,
     summary="Create a new expense",
     description="Create a new expense with description and amount for the authenticated user.",
 )
-def create_expense(
+async def create_expense(
     expense: schemas.ExpenseCreate,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: schemas.UserOut = Depends(dependencies.get_current_user),
     _: callable = Depends(dependencies.get_i18n_translator),
-    cache: CacheManager = Depends(CacheManager),
+    cache: AsyncCacheManager = Depends(get_async_cache),
+    ingest: GroupCommitQueue | None = Depends(get_ingest_queue),
 ):
-    cache.clear_user_cache(current_user.id)
-    return crud.expenses.create_expense(
-        db=db, expense=expense, user_id=current_user.id
+    if ingest is not None:
+        db_expense = await ingest.submit(expense, current_user.id)
+    else:
+        db_expense = await crud.expenses.create_expense_async(
+            db=db, expense=expense, user_id=current_user.id
+        )
+    # The list is patched before the generation is bumped, so a reader
+    # that sees the new generation (and ETag) also sees the new list.
+    await _patch_cached_list(
+        cache, current_user.id, "add", *list_item(db_expense)
     )
+    await cache.clear_user_cache(current_user.id)
+    return db_expense
+
+
+@router.post(
+    "/bulk",
+    dependencies=[Depends(dependencies.pin_reads_to_primary)],
+    response_model=schemas.ExpenseBulkOut,
+    status_code=201,
+    summary="Create many expenses",
+    description=f"Create up to {schemas.BULK_MAX_ITEMS} expenses for the "
+    "authenticated user in a single transaction. Returns the new ids in "
+    "request order.",
+)
+async def create_expenses_bulk(
+    payload: schemas.ExpenseBulkCreate,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: schemas.UserOut = Depends(dependencies.get_current_user),
+    _: callable = Depends(dependencies.get_i18n_translator),
+    cache: AsyncCacheManager = Depends(get_async_cache),
+):
+    ids = await crud.expenses.create_expenses_bulk_async(
+        db=db, expenses=payload.items, user_id=current_user.id
+    )
+    # Bulk responses carry no rows to patch in, so the list is dropped.
+    await _patch_cached_list(cache, current_user.id, "drop")
+    await cache.clear_user_cache(current_user.id)
+    return {"ids": ids}
 
 
 @router.get(
     "/",
     response_model=list[schemas.ExpenseOut],
     summary="List all expenses",
-    description="Retrieve a list of all expenses for the authenticated user.",
+    description="Retrieve the expenses of the authenticated user, oldest "
+    "first. Pass `limit` (and the `X-Next-Cursor` header of the previous "
+    "response as `cursor`) to page through them; the header is absent on "
+    "the last page. Send the `ETag` of a previous response as "
+    "`If-None-Match` to get `304 Not Modified` if nothing has changed.",
+)
+async def get_expenses(
+    limit: int | None = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+    if_none_match: str | None = Header(None),
+    session_factory: async_sessionmaker = Depends(
+        dependencies.get_async_read_session_factory
+    ),
+    current_user: schemas.UserOut = Depends(dependencies.get_current_user),
+    _: callable = Depends(dependencies.get_i18n_translator),
+    cache: AsyncCacheManager = Depends(get_async_cache),
+):
+    # The generation is read before any data, so an ETag can only ever
+    # label data at least as new as itself.
+    generation = await cache.generation(current_user.id)
+    headers = etag_headers(current_user.id, generation)
+    if headers and etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
+
+    if limit is None and cursor is None:
+        return await _get_all_expenses(
+            session_factory, current_user.id, cache, generation, headers
+        )
+
+    try:
+        after = pagination.decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise InvalidCursorError(cursor=cursor, translator=_) from e
+    limit = limit or pagination.DEFAULT_PAGE_SIZE
+
+    # A page is cached as "<next cursor>\n<JSON body>"; cursors are
+    # base64url and compact JSON has no raw newlines, so the first newline
+    # splits it.
+    async def build() -> bytes:
+        async with session_factory() as db:
+            expenses, next_position = (
+                await crud.expenses.get_expenses_page_async(
+                    db=db, user_id=current_user.id, limit=limit, after=after
+                )
+            )
+        next_cursor = (
+            pagination.encode_cursor(*next_position) if next_position else ""
+        )
+        return next_cursor.encode() + b"\n" + encode_expense_list(expenses)
+
+    if generation is None:
+        page = await build()
+    else:
+        page = await cache.get_or_build_raw(
+            versioned_key(
+                current_user.id, generation, "page", limit, cursor or "first"
+            ),
+            build,
+            expire_seconds=300,
+        )
+    next_cursor, body = page.split(b"\n", 1)
+    next_cursor = next_cursor.decode()
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return json_bytes_response(body, headers)
+
+
+@router.get(
+    "/export",
+    summary="Export expenses",
+    description="Stream every expense of the authenticated user as NDJSON "
+    "(one JSON object per line) or CSV, oldest first.",
+    response_class=StreamingResponse,
 )
-def get_expenses(
-    db: Session = Depends(database.get_db),
+async def export_expenses(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    session_factory: async_sessionmaker = Depends(
+        dependencies.get_async_read_session_factory
+    ),
     current_user: schemas.UserOut = Depends(dependencies.get_current_user),
     _: callable = Depends(dependencies.get_i18n_translator),
-    cache: CacheManager = Depends(CacheManager),
 ):
-    cache_key = f"expenses:{current_user.id}"
-    cached_expenses = cache.get(cache_key)
-    if cached_expenses:
-        return cached_expenses
+    # Rows are read from a server-side cursor and sent batch by batch, so
+    # memory stays flat and the first bytes go out immediately.
+    return StreamingResponse(
+        _export_expenses(session_factory, current_user.id, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="expenses.{export_format}"'
+            )
+        },
+    )
 
-    expenses = crud.expenses.get_expenses(db=db, user_id=current_user.id)
-    expenses_data = [serialize_expense(exp) for exp in expenses]
 
-    cache.set(cache_key, expenses_data, expire_seconds=300)
-    return expenses_data
+@router.get(
+    "/summary",
+    response_model=list[schemas.ExpenseSummaryBucket],
+    summary="Summarize expenses",
+    description="Total and count of the authenticated user's expenses per "
+    "day or month (UTC), oldest bucket first. `bucket` is the first day of "
+    "the period.",
+)
+async def get_summary(
+    granularity: Literal["day", "month"] = Query("month"),
+    db: AsyncSession = Depends(dependencies.get_async_read_db),
+    current_user: schemas.UserOut = Depends(dependencies.get_current_user),
+    _: callable = Depends(dependencies.get_i18n_translator),
+    cache: AsyncCacheManager = Depends(get_async_cache),
+):
+    # Read from expense_rollups, one row per bucket. Every expense write
+    # bumps the user's generation, which also retires cached summaries.
+    cache_key = await cache.user_key(current_user.id, "summary", granularity)
+    if cache_key:
+        cached_body = await cache.get_raw(cache_key)
+        if cached_body is not None:
+            return json_bytes_response(cached_body)
+
+    buckets = await crud.rollups.get_summary_async(
+        db=db, user_id=current_user.id, granularity=granularity
+    )
+    body = summary_adapter.dump_json(
+        summary_adapter.validate_python(buckets, from_attributes=True)
+    )
+
+    if cache_key:
+        await cache.set_raw(cache_key, body, expire_seconds=300)
+    return json_bytes_response(body)
 
 
 @router.get(
     "/{expense_id}",
     response_model=schemas.ExpenseOut,
     summary="Get an expense",
-    description="Retrieve details of a specific expense by ID for the authenticated user.",
+    description="Retrieve details of a specific expense by ID for the "
+    "authenticated user. Supports `If-None-Match` like the list.",
 )
-def get_expense(
+async def get_expense(
     expense_id: int,
-    db: Session = Depends(database.get_db),
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(dependencies.get_async_read_db),
     current_user: schemas.UserOut = Depends(dependencies.get_current_user),
     _: callable = Depends(dependencies.get_i18n_translator),
+    cache: AsyncCacheManager = Depends(get_async_cache),
 ):
-    db_expense = crud.expenses.get_expense(
+    # Per-user rather than per-expense: a write to any expense changes
+    # it, which costs a few extra full responses but no extra state.
+    headers = etag_headers(
+        current_user.id, await cache.generation(current_user.id)
+    )
+    matches = bool(headers) and etag_matches(if_none_match, headers["ETag"])
+    # "*" only matches an expense that exists, so it is checked after the
+    # lookup; a listed tag already implies the expense existed at it.
+    if matches and if_none_match.strip() != "*":
+        return not_modified(headers)
+
+    db_expense = await crud.expenses.get_expense_async(
         db=db, expense_id=expense_id, user_id=current_user.id
     )
     if not db_expense:
         raise ExpenseNotFoundError(expense_id=expense_id, translator=_)
+    if matches:
+        return not_modified(headers)
+    response.headers.update(headers)
     return serialize_expense(db_expense)
 
 
 @router.put(
     "/{expense_id}",
+    dependencies=[Depends(dependencies.pin_reads_to_primary)],
     response_model=schemas.ExpenseOut,
     summary="Update an expense",
     description="Update an existing expense by ID for the authenticated user.",
 )
-def update_expense(
+async def update_expense(
     expense_id: int,
     expense: schemas.ExpenseUpdate,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: schemas.UserOut = Depends(dependencies.get_current_user),
     _: callable = Depends(dependencies.get_i18n_translator),
-    cache: CacheManager = Depends(CacheManager),
+    cache: AsyncCacheManager = Depends(get_async_cache),
 ):
-    updated = crud.expenses.update_expense(
+    updated = await crud.expenses.update_expense_async(
         db=db, expense_id=expense_id, expense=expense, user_id=current_user.id
     )
     if not updated:
         raise ExpenseNotFoundError(expense_id=expense_id, translator=_)
-    cache.clear_user_cache(current_user.id)
+    # Dropped rather than patched: concurrent updates of one expense may
+    # reach Redis in the opposite order to their commits, and the next
+    # read refills the list from the database.
+    await _patch_cached_list(cache, current_user.id, "drop")
+    await cache.clear_user_cache(current_user.id)
     return serialize_expense(updated)
 
 
 @router.delete(
     "/{expense_id}",
+    dependencies=[Depends(dependencies.pin_reads_to_primary)],
     status_code=204,
     summary="Delete an expense",
     description="Delete an expense by ID for the authenticated user.",
 )
-def delete_expense(
+async def delete_expense(
     expense_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     current_user: schemas.UserOut = Depends(dependencies.get_current_user),
     _: callable = Depends(dependencies.get_i18n_translator),
-    cache: CacheManager = Depends(CacheManager),
+    cache: AsyncCacheManager = Depends(get_async_cache),
 ):
-    db_expense = crud.expenses.get_expense(
+    deleted = await crud.expenses.delete_expense_async(
         db=db, expense_id=expense_id, user_id=current_user.id
     )
-    if not db_expense:
+    if deleted is None:
         raise ExpenseNotFoundError(expense_id=expense_id, translator=_)
-    crud.expenses.delete_expense(
-        db=db, expense_id=expense_id, user_id=current_user.id
+    await _patch_cached_list(
+        cache, current_user.id, "remove", list_field(deleted)
     )
-    cache.clear_user_cache(current_user.id)
+    await cache.clear_user_cache(current_user.id)
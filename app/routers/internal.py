@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from .. import database, dependencies
+from ..metrics import REGISTRY, GaugeCallback
+from ..pool import pool_status
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    include_in_schema=False,
+    dependencies=[Depends(dependencies.require_internal_token)],
+)
+
+metrics_router = APIRouter(
+    include_in_schema=False,
+    dependencies=[Depends(dependencies.require_internal_token)],
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _engines() -> dict:
+    engines = {
+        "sync": database.engine,
+        "async": database.async_engine.sync_engine,
+    }
+    if database.async_replica_engine is not None:
+        engines["replica"] = database.async_replica_engine.sync_engine
+    return engines
+
+
+def _pool_samples():
+    for name, engine in _engines().items():
+        status = pool_status(engine)
+        for state in ("checked_in", "checked_out", "overflow"):
+            if state in status:
+                yield (name, state), status[state]
+
+
+REGISTRY.register(
+    GaugeCallback(
+        "db_pool_connections",
+        "Connections of this worker's database pools by state.",
+        ("engine", "state"),
+        _pool_samples,
+    )
+)
+
+
+@router.get("/pool", summary="Database pool statistics")
+async def get_pool_stats():
+    """Occupancy and checkout counters of this worker's database pools.
+
+    Counters are cumulative since the worker started; every worker process
+    has its own pools, so scrape each one or aggregate them.
+    """
+    return {
+        "config": {
+            "pool_size": database.DB_POOL_SIZE,
+            "max_overflow": database.DB_MAX_OVERFLOW,
+            "pool_timeout": database.DB_POOL_TIMEOUT,
+            "pool_recycle": database.DB_POOL_RECYCLE,
+            "pool_pre_ping": database.DB_POOL_PRE_PING,
+        },
+        **{name: pool_status(engine) for name, engine in _engines().items()},
+    }
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Metrics of this worker in the Prometheus text format."""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE
+    )
@@ -1,6 +1,8 @@
-from datetime import datetime
+from datetime import date, datetime
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
+
+BULK_MAX_ITEMS = 10000
 
 
 class UserBase(BaseModel):
@@ -25,6 +27,16 @@ class ExpenseCreate(ExpenseBase):
     pass
 
 
+class ExpenseBulkCreate(BaseModel):
+    items: list[ExpenseCreate] = Field(
+        min_length=1, max_length=BULK_MAX_ITEMS
+    )
+
+
+class ExpenseBulkOut(BaseModel):
+    ids: list[int]
+
+
 class ExpenseUpdate(BaseModel):
     description: str | None = None
     amount: float | None = None
@@ -36,6 +48,13 @@ class ExpenseOut(ExpenseBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ExpenseSummaryBucket(BaseModel):
+    bucket: date
+    total: float
+    count: int
+    model_config = ConfigDict(from_attributes=True)
+
+
 class Token(BaseModel):
     access_token: str
     refresh_token: str
@@ -0,0 +1,54 @@
+import json
+import os
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+# "orjson" (default when installed) or "json" for the stdlib encoder.
+# Either way dumps() returns compact UTF-8 bytes and encodes datetimes as
+# ISO 8601, so the backends can be swapped without changing any payload.
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson" if orjson else "json")
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(
+        f"Object of type {type(value).__name__} is not JSON serializable"
+    )
+
+
+def _stdlib_dumps(value: Any) -> bytes:
+    # Same output as orjson: compact separators, UTF-8, ISO 8601 dates.
+    return json.dumps(
+        value, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+if JSON_BACKEND == "orjson":
+    if orjson is None:
+        raise RuntimeError("JSON_BACKEND=orjson but orjson is not installed")
+    dumps = orjson.dumps
+    loads = orjson.loads
+elif JSON_BACKEND == "json":
+    dumps = _stdlib_dumps
+    loads = json.loads
+else:
+    raise RuntimeError(f"Unknown JSON_BACKEND: {JSON_BACKEND}")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the configured backend.
+
+    Used as the app's default response class. Content reaching it has
+    already been validated against the route's response_model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,87 @@
+import math
+import os
+from pathlib import Path
+
+from uvicorn_worker import UvicornWorker
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def _cgroup_cpu_limit(root: Path) -> float | None:
+    """CPU quota of the container, in cores, or None when unlimited."""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        quota, period = (root / "cpu.max").read_text().split()
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1: quota is -1 when unlimited
+        quota = int((root / "cpu" / "cpu.cfs_quota_us").read_text())
+        period = int((root / "cpu" / "cpu.cfs_period_us").read_text())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 else None
+
+
+def available_cpus(cgroup_root: Path = CGROUP_ROOT) -> int:
+    """Cores this process may actually use.
+
+    os.cpu_count() reports the host's cores; a container is limited by its
+    CPU affinity and by its cgroup quota (``docker run --cpus``), so take
+    the smaller of the two, rounded up.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit(cgroup_root)
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(cpus, 1)
+
+
+def reset_after_fork() -> None:
+    """Drop connection state inherited from the gunicorn master.
+
+    With preload_app the app, its engines and Redis pools are created once
+    in the master and copied into every worker. The clients only connect
+    lazily, but if the master ever opened a socket, two processes would
+    share it; give each worker empty pools instead. close=False leaves
+    the parent's connections alone rather than closing them from here.
+    """
+    from app.database import (
+        async_engine,
+        async_redis_pool,
+        async_redis_pubsub_client,
+        async_replica_engine,
+        engine,
+        redis_client,
+    )
+
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    if async_replica_engine is not None:
+        async_replica_engine.sync_engine.dispose(close=False)
+    redis_client.connection_pool.reset()
+    async_redis_pool.reset()
+    async_redis_pubsub_client.connection_pool.reset()
+
+
+class Worker(UvicornWorker):
+    """Uvicorn worker that drains within gunicorn's graceful timeout.
+
+    On SIGTERM uvicorn stops accepting, waits for in-flight requests and
+    then runs the lifespan shutdown (which flushes the ingest queue). By
+    default it waits for requests indefinitely, and the master would
+    SIGKILL the worker at graceful_timeout, skipping the shutdown; bound
+    the wait so there is time left for it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.config.timeout_graceful_shutdown = max(
+            self.cfg.graceful_timeout - 5, 1
+        )
@@ -0,0 +1,62 @@
+import asyncio
+import os
+
+import redis
+import redis.asyncio as aioredis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+APP_ENV = os.getenv("APP_ENV", "development")
+# Alembic owns the schema in production; create_all is a development aid.
+DB_CREATE_ALL = (
+    os.getenv("DB_CREATE_ALL", str(APP_ENV != "production")).lower() == "true"
+)
+# Connections opened per worker before it starts serving.
+STARTUP_DB_CONNECTIONS = int(os.getenv("STARTUP_DB_CONNECTIONS", "2"))
+STARTUP_REDIS_CONNECTIONS = int(os.getenv("STARTUP_REDIS_CONNECTIONS", "2"))
+
+
+async def create_schema(engine: AsyncEngine, metadata) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+
+
+async def warm_db_pool(engine: AsyncEngine, connections: int) -> int:
+    """Open ``connections`` pooled connections at once and return them.
+
+    They are checked out together so the pool has to open each one, and
+    checked back in so the first requests find them ready. Capped at the
+    pool size, beyond which returned connections would just be closed.
+    """
+    size = getattr(engine.pool, "size", None)
+    if size is not None:
+        connections = min(connections, size())
+    if connections <= 0:
+        return 0
+
+    async def hold(ready: asyncio.Barrier):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await ready.wait()
+
+    try:
+        ready = asyncio.Barrier(connections)
+        async with asyncio.TaskGroup() as group:
+            for _ in range(connections):
+                group.create_task(hold(ready))
+    except Exception as e:
+        print(f"Database warm-up error: {e}")
+        return 0
+    return connections
+
+
+async def warm_redis_pool(client: aioredis.Redis, connections: int) -> int:
+    """Open up to ``connections`` Redis connections with concurrent PINGs."""
+    if connections <= 0:
+        return 0
+    try:
+        await asyncio.gather(*(client.ping() for _ in range(connections)))
+    except redis.RedisError as e:
+        print(f"Redis warm-up error: {e}")
+        return 0
+    return connections
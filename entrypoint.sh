@@ -3,5 +3,5 @@
 # Run migrations
 alembic upgrade head
 
-# Start app
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+# Start app: gunicorn with one uvicorn worker per core (gunicorn.conf.py)
+exec gunicorn app.main:app
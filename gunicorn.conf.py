@@ -0,0 +1,30 @@
+# Production server settings, read by `gunicorn app.main:app` from the
+# working directory. Every value can be overridden from the environment.
+import os
+
+from app.server import available_cpus, reset_after_fork
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "app.server.Worker"
+# Async workers: one per usable core is enough to keep them all busy.
+workers = int(os.getenv("WEB_CONCURRENCY") or available_cpus())
+
+# Import the app once in the master so workers fork with it loaded.
+preload_app = True
+
+# Recycle each worker after this many requests (0 disables); the jitter
+# keeps workers from restarting all at once.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+# SIGTERM stops accepting connections and gives in-flight requests this
+# long to finish before workers are killed.
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    reset_after_fork()
@@ -0,0 +1,75 @@
+import asyncio
+
+from app.cache import AsyncCacheManager
+from app.dependencies import invalidate_principals
+from app.hashing import password_hasher
+
+
+def test_register_and_login(client):
+    response = client.post(
+        "/auth/register",
+        json={"username": "alice", "password": "s3cret"},
+        params={"lang": "en"},
+    )
+    assert response.status_code == 200
+    assert response.json()["username"] == "alice"
+
+    response = client.post(
+        "/auth/login",
+        json={"username": "alice", "password": "s3cret"},
+        params={"lang": "en"},
+    )
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+    assert "access_token" in response.cookies
+
+
+def test_login_wrong_password(client):
+    client.post(
+        "/auth/register",
+        json={"username": "alice", "password": "s3cret"},
+    )
+    response = client.post(
+        "/auth/login",
+        json={"username": "alice", "password": "wrong"},
+        params={"lang": "en"},
+    )
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Incorrect username or password"
+
+
+def test_register_duplicate_username(client, test_user):
+    response = client.post(
+        "/auth/register",
+        json={"username": test_user.username, "password": "s3cret"},
+        params={"lang": "en"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Username already registered"
+
+
+def test_current_user_cached_per_token(
+    client, auth_headers, db, test_user, redis_client
+):
+    assert client.get("/expenses/", headers=auth_headers).status_code == 200
+    db.delete(test_user)
+    db.commit()
+
+    # Served from the principal cache without touching the users table.
+    assert client.get("/expenses/", headers=auth_headers).status_code == 200
+
+    asyncio.run(
+        invalidate_principals(AsyncCacheManager(redis_client), test_user.id)
+    )
+    assert client.get("/expenses/", headers=auth_headers).status_code == 401
+
+
+def test_register_fails_fast_when_hashing_queue_full(client, monkeypatch):
+    monkeypatch.setattr(password_hasher, "max_pending", 0)
+    response = client.post(
+        "/auth/register",
+        json={"username": "alice", "password": "s3cret"},
+        params={"lang": "en"},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(password_hasher.retry_after)
@@ -0,0 +1,293 @@
+import asyncio
+from contextlib import suppress
+
+import fakeredis
+import pytest
+import redis.asyncio as aioredis
+
+from app.cache import (
+    AsyncCacheManager,
+    LocalCache,
+    listen_for_invalidations,
+    lock_key,
+)
+from app.metrics import cache_errors_total
+
+
+@pytest.fixture
+def async_cache():
+    return AsyncCacheManager(fakeredis.FakeAsyncRedis())
+
+
+@pytest.mark.asyncio
+async def test_async_cache_roundtrip(async_cache):
+    assert await async_cache.set("expenses:1", [{"id": 1}])
+    assert await async_cache.get("expenses:1") == [{"id": 1}]
+    assert await async_cache.delete("expenses:1")
+    assert await async_cache.get("expenses:1") is None
+
+
+@pytest.mark.asyncio
+async def test_async_cache_clear_user_cache(async_cache):
+    key = await async_cache.user_key(1)
+    await async_cache.set(key, [{"id": 1}])
+    other_key = await async_cache.user_key(12)
+    await async_cache.set(other_key, [{"id": 2}])
+
+    assert await async_cache.clear_user_cache(1)
+
+    new_key = await async_cache.user_key(1)
+    assert new_key != key
+    assert await async_cache.get(new_key) is None
+    assert await async_cache.user_key(12) == other_key
+    assert await async_cache.get(other_key) == [{"id": 2}]
+
+
+@pytest.mark.asyncio
+async def test_async_cache_write_through_list(async_cache):
+    assert await async_cache.get_list(1) is None
+    version = await async_cache.list_version(1)
+    assert await async_cache.fill_list(1, version, [("b", b"2"), ("a", b"1")])
+    assert await async_cache.get_list(1) == b"[1,2]"
+
+    await async_cache.patch_list(1, "add", "c", b"3")
+    await async_cache.patch_list(1, "remove", "b")
+    assert await async_cache.get_list(1) == b"[1,3]"
+
+    await async_cache.patch_list(1, "remove", "a", "c")
+    assert await async_cache.get_list(1) == b"[]"
+
+    await async_cache.patch_list(1, "drop")
+    await async_cache.patch_list(1, "add", "d", b"4")  # not resurrected
+    assert await async_cache.get_list(1) is None
+
+
+@pytest.mark.asyncio
+async def test_async_cache_fill_list_skipped_after_write(async_cache):
+    version = await async_cache.list_version(1)
+    # A write lands between reading the rows and filling the cache.
+    await async_cache.patch_list(1, "add", "b", b"2")
+    assert not await async_cache.fill_list(1, version, [("a", b"1")])
+    assert await async_cache.get_list(1) is None
+
+
+def test_local_cache_evicts_least_recently_used():
+    local = LocalCache(max_items=2, ttl=60)
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+    local.set("c", 3)
+
+    assert local.get("a") == 1
+    assert local.get("b") is None
+    assert local.get("c") == 3
+
+
+def test_local_cache_expires_entries():
+    local = LocalCache(max_items=2, ttl=60)
+    local.set("a", 1, ttl=0)
+
+    assert local.get("a") is None
+    assert len(local) == 0
+
+
+@pytest.mark.asyncio
+async def test_async_cache_serves_hits_from_local_cache():
+    redis_client = fakeredis.FakeAsyncRedis()
+    cache = AsyncCacheManager(redis_client, LocalCache(100, 60))
+    key = await cache.user_key(1)
+    await cache.set(key, [{"id": 1}])
+    await redis_client.flushall()
+
+    assert await cache.user_key(1) == key
+    assert await cache.get(key) == [{"id": 1}]
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_other_workers():
+    redis_client = fakeredis.FakeAsyncRedis()
+    writer = AsyncCacheManager(redis_client, LocalCache(100, 60))
+    local = LocalCache(100, 60)
+    reader = AsyncCacheManager(redis_client, local)
+    listener = asyncio.create_task(
+        listen_for_invalidations(redis_client, local)
+    )
+    await asyncio.sleep(0.1)
+    key = await reader.user_key(1)
+
+    await writer.clear_user_cache(1)
+    await asyncio.sleep(0.1)
+    listener.cancel()
+
+    assert await reader.user_key(1) != key
+
+
+def _resp(*items) -> bytes:
+    out = b"*%d\r\n" % len(items)
+    for item in items:
+        if isinstance(item, int):
+            out += b":%d\r\n" % item
+        else:
+            out += b"$%d\r\n%s\r\n" % (len(item), item)
+    return out
+
+
+class _PubSubServer:
+    """Just enough of a Redis server for one subscriber over real TCP."""
+
+    def __init__(self):
+        self.subscribers = []
+
+    async def handle(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                args = []
+                for _ in range(int(line[1:])):
+                    size = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(size + 2))[:-2])
+                command = args[0].upper()
+                if command == b"SUBSCRIBE":
+                    self.subscribers.append(writer)
+                    writer.write(_resp(b"subscribe", args[1], 1))
+                elif command == b"PING":
+                    writer.write(_resp(b"pong", *args[1:2]))
+                else:
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+    def publish(self, channel: bytes, data: bytes):
+        for writer in self.subscribers:
+            writer.write(_resp(b"message", channel, data))
+
+
+@pytest.mark.asyncio
+async def test_invalidation_listener_survives_idle_socket_timeout():
+    fake = _PubSubServer()
+    server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    # A socket timeout well below the idle period, as on the shared pool.
+    redis_client = aioredis.Redis(port=port, socket_timeout=0.1)
+    local = LocalCache(100, 60)
+    errors_before = cache_errors_total.value("listen")
+    listener = asyncio.create_task(
+        listen_for_invalidations(redis_client, local, poll_seconds=0.2)
+    )
+    await asyncio.sleep(0.1)
+    local.set("gen:expenses:1", 3)
+    local.set("gen:expenses:2", 5)
+
+    await asyncio.sleep(0.6)  # idle channel
+    assert local.get("gen:expenses:1") == 3
+    assert cache_errors_total.value("listen") == errors_before
+
+    fake.publish(b"cache:invalidate", b"gen:expenses:1")
+    await asyncio.sleep(0.1)
+    listener.cancel()
+    with suppress(asyncio.CancelledError):
+        await listener
+    await redis_client.aclose()
+    server.close()
+
+    assert local.get("gen:expenses:1") is None
+    assert local.get("gen:expenses:2") == 5
+
+
+@pytest.mark.asyncio
+async def test_get_or_build_raw_builds_once_for_concurrent_misses(
+    async_cache,
+):
+    calls = 0
+
+    async def build():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b"[1]"
+
+    results = await asyncio.gather(
+        *(
+            async_cache.get_or_build_raw("expenses:1:v0", build)
+            for _ in range(10)
+        )
+    )
+
+    assert results == [b"[1]"] * 10
+    assert calls == 1
+    assert await async_cache.get_raw("expenses:1:v0") == b"[1]"
+    assert not await async_cache.redis.exists(lock_key("expenses:1:v0"))
+
+
+@pytest.mark.asyncio
+async def test_get_or_build_raw_waits_for_other_worker(async_cache):
+    key = "expenses:1:v0"
+    # Another worker holds the lock and stores the entry shortly after.
+    await async_cache.redis.set(lock_key(key), "other", px=5000)
+
+    async def other_worker():
+        await asyncio.sleep(0.05)
+        await async_cache.redis.set(key, b"[2]")
+
+    async def build():
+        raise AssertionError("should use the other worker's result")
+
+    writer = asyncio.create_task(other_worker())
+    assert await async_cache.get_or_build_raw(key, build) == b"[2]"
+    await writer
+
+
+@pytest.mark.asyncio
+async def test_get_or_build_raw_serves_stale_while_refreshing(async_cache):
+    key = "expenses:1:v0"
+    # Past its fresh TTL: only the stale window is left.
+    await async_cache.redis.set(key, b"[old]", ex=30)
+    refreshed = asyncio.Event()
+
+    async def build():
+        refreshed.set()
+        return b"[new]"
+
+    assert (
+        await async_cache.get_or_build_raw(
+            key, build, expire_seconds=300, stale_seconds=60
+        )
+        == b"[old]"
+    )
+    await asyncio.wait_for(refreshed.wait(), 1)
+    await asyncio.sleep(0.01)
+    assert await async_cache.redis.get(key) == b"[new]"
+    assert await async_cache.redis.ttl(key) > 300
+
+
+@pytest.mark.asyncio
+async def test_async_cache_batched_operations(async_cache):
+    assert await async_cache.set_many(
+        {"a": {"id": 1}, "b": [2]}, expire_seconds=300, ttls={"b": 10}
+    )
+    assert await async_cache.get_many(["a", "missing", "b"]) == [
+        {"id": 1},
+        None,
+        [2],
+    ]
+    assert 290 < await async_cache.redis.ttl("a") <= 300
+    assert 0 < await async_cache.redis.ttl("b") <= 10
+
+    assert await async_cache.delete_many(["a", "b"])
+    assert await async_cache.get_many(["a", "b"]) == [None, None]
+
+
+@pytest.mark.asyncio
+async def test_async_cache_prefetched_generations(async_cache):
+    await async_cache.clear_user_cache(1, namespace="principal")
+    assert await async_cache.generations(1, "principal", "expenses") == {
+        "principal": 1,
+        "expenses": 0,
+    }
+    await async_cache.clear_user_cache(1)  # drops the prefetched value
+    await async_cache.redis.set("gen:principal:1", 5)
+
+    # The prefetched generation is used once, then read again.
+    assert await async_cache.generation(1, "principal") == 1
+    assert await async_cache.generation(1, "principal") == 5
+    assert await async_cache.generation(1) == 1
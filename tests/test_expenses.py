@@ -1,58 +1,21 @@
-import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-from app.database import Base, get_db
-from app.dependencies import create_access_token
-from app.main import app
-from app.models import User
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-TestingSessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine
-)
-
-
-@pytest.fixture
-def db():
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-        Base.metadata.drop_all(bind=engine)
-
-
-@pytest.fixture
-def client(db):
-    def override_get_db():
-        try:
-            yield db
-        finally:
-            db.close()
-
-    app.dependency_overrides[get_db] = override_get_db
-    return TestClient(app)
-
-
-@pytest.fixture
-def test_user(db):
-    user = User(username="testuser", hashed_password="123")
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+import asyncio
+import csv
+import io
+import json
+from datetime import UTC, datetime
 
+import httpx
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
-@pytest.fixture
-def auth_headers(test_user):
-    access_token = create_access_token(data={"sub": str(test_user.id)})
-    return {"Authorization": f"Bearer {access_token}"}
+from app import crud, database, dependencies, schemas
+from app.cache import AsyncCacheManager, list_key
+from app.crud import rollups
+from app.database import Base
+from app.main import app
+from app.pagination import encode_cursor
+from app.routers import expenses as expenses_router
 
 
 def test_get_nonexistent_expense(client, auth_headers):
@@ -104,3 +67,407 @@ def test_get_expenses_success(client, auth_headers, db):
     assert isinstance(response.json(), list)
     assert len(response.json()) > 0
     assert response.json()[0]["description"] == "Coffee"
+
+
+def test_get_expenses_paginated(client, auth_headers):
+    for description in ("Coffee", "Lunch", "Dinner"):
+        client.post(
+            "/expenses/",
+            json={"description": description, "amount": 5.0},
+            headers=auth_headers,
+        )
+
+    response = client.get(
+        "/expenses/", headers=auth_headers, params={"limit": 2}
+    )
+    assert response.status_code == 200
+    assert [e["description"] for e in response.json()] == ["Coffee", "Lunch"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(
+        "/expenses/",
+        headers=auth_headers,
+        params={"limit": 2, "cursor": cursor},
+    )
+    assert response.status_code == 200
+    assert [e["description"] for e in response.json()] == ["Dinner"]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_expenses_invalid_cursor(client, auth_headers):
+    response = client.get(
+        "/expenses/",
+        headers=auth_headers,
+        params={"limit": 2, "cursor": "not-a-cursor", "lang": "en"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid pagination cursor"
+
+
+def test_get_expenses_rejects_aware_cursor(client, auth_headers):
+    created_at = datetime(2024, 1, 1, tzinfo=UTC)
+    response = client.get(
+        "/expenses/",
+        headers=auth_headers,
+        params={"limit": 2, "cursor": encode_cursor(created_at, 1)},
+    )
+    assert response.status_code == 400
+
+
+def test_get_expenses_served_from_cache(client, auth_headers, db):
+    client.post(
+        "/expenses/",
+        json={"description": "Coffee", "amount": 5.0},
+        headers=auth_headers,
+    )
+    first = client.get("/expenses/", headers=auth_headers)
+    db.execute(text("DELETE FROM expenses"))
+    db.commit()
+
+    cached = client.get("/expenses/", headers=auth_headers)
+    assert cached.status_code == 200
+    assert cached.headers["content-type"] == "application/json"
+    assert cached.content == first.content
+
+    client.post(
+        "/expenses/",
+        json={"description": "Lunch", "amount": 7.5},
+        headers=auth_headers,
+    )
+    response = client.get("/expenses/", headers=auth_headers)
+    assert [e["description"] for e in response.json()] == ["Lunch"]
+
+
+def test_create_expenses_bulk(client, auth_headers):
+    items = [{"description": f"Item {i}", "amount": i} for i in range(25)]
+    response = client.post(
+        "/expenses/bulk", json={"items": items}, headers=auth_headers
+    )
+    assert response.status_code == 201
+    ids = response.json()["ids"]
+    assert len(ids) == 25
+
+    response = client.get("/expenses/", headers=auth_headers)
+    assert [e["id"] for e in response.json()] == ids
+    assert response.json()[3]["description"] == "Item 3"
+
+
+def test_create_expenses_bulk_rejects_empty(client, auth_headers):
+    response = client.post(
+        "/expenses/bulk", json={"items": []}, headers=auth_headers
+    )
+    assert response.status_code == 422
+
+
+def test_export_expenses(client, auth_headers):
+    items = [{"description": f"Item {i}", "amount": i} for i in range(3)]
+    client.post("/expenses/bulk", json={"items": items}, headers=auth_headers)
+
+    response = client.get(
+        "/expenses/export", headers=auth_headers, params={"format": "ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["description"] for line in lines] == [
+        "Item 0",
+        "Item 1",
+        "Item 2",
+    ]
+
+    response = client.get(
+        "/expenses/export", headers=auth_headers, params={"format": "csv"}
+    )
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "description", "amount", "created_at"]
+    assert [row[1] for row in rows[1:]] == ["Item 0", "Item 1", "Item 2"]
+
+
+def test_expense_summary_tracks_writes(client, auth_headers):
+    items = [{"description": f"Item {i}", "amount": i} for i in range(1, 4)]
+    client.post("/expenses/bulk", json={"items": items}, headers=auth_headers)
+    created = client.post(
+        "/expenses/",
+        json={"description": "Coffee", "amount": 5.0},
+        headers=auth_headers,
+    ).json()
+
+    response = client.get(
+        "/expenses/summary",
+        headers=auth_headers,
+        params={"granularity": "month"},
+    )
+    assert response.status_code == 200
+    [bucket] = response.json()
+    assert bucket["bucket"] == created["created_at"][:8] + "01"
+    assert (bucket["total"], bucket["count"]) == (11.0, 4)
+
+    client.put(
+        f"/expenses/{created['id']}",
+        json={"amount": 9.0},
+        headers=auth_headers,
+    )
+    client.delete("/expenses/1", headers=auth_headers)
+
+    response = client.get(
+        "/expenses/summary",
+        headers=auth_headers,
+        params={"granularity": "day"},
+    )
+    [bucket] = response.json()
+    assert bucket["bucket"] == created["created_at"][:10]
+    assert (bucket["total"], bucket["count"]) == (14.0, 3)
+
+
+def test_sync_crud_keeps_summary_in_step(client, auth_headers, db, test_user):
+    # The sync fallback writes maintain the rollups the async reads use.
+    created = [
+        crud.expenses.create_expense(
+            db, schemas.ExpenseCreate(description=d, amount=a), test_user.id
+        )
+        for d, a in (("Coffee", 5.0), ("Lunch", 12.0))
+    ]
+    crud.expenses.update_expense(
+        db, created[0].id, schemas.ExpenseUpdate(amount=7.0), test_user.id
+    )
+    assert crud.expenses.delete_expense(db, created[1].id, test_user.id)
+    assert crud.expenses.delete_expense(db, 999, test_user.id) is None
+    assert [
+        e.amount for e in crud.expenses.get_expenses(db, test_user.id)
+    ] == [7.0]
+
+    response = client.get(
+        "/expenses/summary",
+        headers=auth_headers,
+        params={"granularity": "day"},
+    )
+    [bucket] = response.json()
+    assert (bucket["total"], bucket["count"]) == (7.0, 1)
+
+
+def test_rollup_deltas_merge_in_lock_order():
+    deltas = [
+        {
+            "user_id": 2,
+            "granularity": "month",
+            "bucket": b,
+            "total": 1.0,
+            "count": 1,
+        }
+        for b in ("2024-03-01", "2024-01-01", "2024-03-01")
+    ] + [
+        {
+            "user_id": 1,
+            "granularity": "day",
+            "bucket": "2024-02-02",
+            "total": 2.0,
+            "count": 1,
+        }
+    ]
+    merged = rollups._merge_deltas(deltas)
+    assert [(d["user_id"], d["bucket"], d["count"]) for d in merged] == [
+        (1, "2024-02-02", 1),
+        (2, "2024-01-01", 1),
+        (2, "2024-03-01", 2),
+    ]
+
+
+def test_writes_use_one_statement_per_row(
+    client, auth_headers, sql_statements
+):
+    client.get("/expenses/999", headers=auth_headers)  # caches the principal
+    sql_statements.clear()
+
+    created = client.post(
+        "/expenses/",
+        json={"description": "Coffee", "amount": 5.0},
+        headers=auth_headers,
+    ).json()
+    expense_id = created["id"]
+
+    def verbs():
+        verbs = [s.split(None, 2)[:2] for s in sql_statements]
+        sql_statements.clear()
+        return [" ".join(v) for v in verbs]
+
+    assert verbs() == ["INSERT INTO", "INSERT INTO"]  # expense, rollups
+
+    response = client.put(
+        f"/expenses/{expense_id}",
+        json={"description": "Tea"},
+        headers=auth_headers,
+    )
+    assert response.json()["description"] == "Tea"
+    assert response.json()["created_at"] == created["created_at"]
+    assert verbs() == ["UPDATE expenses"]
+
+    response = client.delete(f"/expenses/{expense_id}", headers=auth_headers)
+    assert response.status_code == 204
+    assert verbs() == ["DELETE FROM", "INSERT INTO"]  # expense, rollups
+
+
+def test_write_through_list_cache(
+    client, auth_headers, db, redis_client, test_user, monkeypatch
+):
+    monkeypatch.setattr(expenses_router, "CACHE_WRITE_THROUGH", True)
+    for description in ("Coffee", "Lunch"):
+        client.post(
+            "/expenses/",
+            json={"description": description, "amount": 5.0},
+            headers=auth_headers,
+        )
+    first = client.get("/expenses/", headers=auth_headers).json()
+
+    # An update drops the list, and the next read refills it.
+    client.put(
+        f"/expenses/{first[1]['id']}",
+        json={"amount": 7.5},
+        headers=auth_headers,
+    )
+    assert asyncio.run(redis_client.exists(list_key(test_user.id))) == 0
+    client.get("/expenses/", headers=auth_headers)
+
+    client.post(
+        "/expenses/",
+        json={"description": "Dinner", "amount": 9.0},
+        headers=auth_headers,
+    )
+    client.delete(f"/expenses/{first[0]['id']}", headers=auth_headers)
+    expected = client.get("/expenses/export", headers=auth_headers).text
+
+    # The writes were applied to the cached list, so it is still served
+    # from Redis and matches the database.
+    db.execute(text("DELETE FROM expenses"))
+    db.commit()
+    cached = client.get("/expenses/", headers=auth_headers).json()
+    assert cached == [json.loads(line) for line in expected.splitlines()]
+    assert [(e["description"], e["amount"]) for e in cached] == [
+        ("Lunch", 7.5),
+        ("Dinner", 9.0),
+    ]
+
+
+def test_write_through_etag_never_labels_an_older_list(
+    client, auth_headers, monkeypatch
+):
+    monkeypatch.setattr(expenses_router, "CACHE_WRITE_THROUGH", True)
+    patch_list = AsyncCacheManager.patch_list
+    racing = []
+
+    async def held_back_patch_list(self, *args, **kwargs):
+        # A GET that runs while the write is still patching the list.
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as http:
+            racing.append(await http.get("/expenses/", headers=auth_headers))
+        return await patch_list(self, *args, **kwargs)
+
+    created = client.post(
+        "/expenses/",
+        json={"description": "Coffee", "amount": 5.0},
+        headers=auth_headers,
+    ).json()
+    client.get("/expenses/", headers=auth_headers)  # fills the list
+
+    monkeypatch.setattr(AsyncCacheManager, "patch_list", held_back_patch_list)
+    client.post(
+        "/expenses/",
+        json={"description": "Lunch", "amount": 9.0},
+        headers=auth_headers,
+    )
+    client.put(
+        f"/expenses/{created['id']}",
+        json={"amount": 7.5},
+        headers=auth_headers,
+    )
+    client.delete(f"/expenses/{created['id']}", headers=auth_headers)
+    client.post(
+        "/expenses/bulk",
+        json={"items": [{"description": "Tea", "amount": 2.0}]},
+        headers=auth_headers,
+    )
+    monkeypatch.setattr(AsyncCacheManager, "patch_list", patch_list)
+    racing.append(client.get("/expenses/", headers=auth_headers))
+
+    # Every racing read carried the ETag of the data it returned: an ETag
+    # seen twice always labelled the same list.
+    bodies = {}
+    for response in racing:
+        etag = response.headers["ETag"]
+        assert bodies.setdefault(etag, response.json()) == response.json()
+
+
+def test_reads_use_replica_outside_read_your_writes_window(
+    client, auth_headers, redis_client, test_user, tmp_path, monkeypatch
+):
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    Base.metadata.create_all(bind=create_engine(replica_url))
+    replica_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}", poolclass=NullPool
+    )
+    monkeypatch.setattr(database, "async_replica_engine", replica_engine)
+    monkeypatch.setattr(
+        database,
+        "AsyncReplicaSessionLocal",
+        async_sessionmaker(bind=replica_engine, expire_on_commit=False),
+    )
+
+    created = client.post(
+        "/expenses/",
+        json={"description": "Lunch", "amount": 12.5},
+        headers=auth_headers,
+    ).json()
+    # Within the window the write is visible: the read went to the primary.
+    response = client.get(f"/expenses/{created['id']}", headers=auth_headers)
+    assert response.status_code == 200
+
+    # Afterwards reads go to the (here never replicated) replica.
+    asyncio.run(
+        redis_client.delete(dependencies.recent_write_key(test_user.id))
+    )
+    response = client.get(f"/expenses/{created['id']}", headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_conditional_get_answers_304_without_sql(
+    client, auth_headers, sql_statements
+):
+    created = client.post(
+        "/expenses/",
+        json={"description": "Coffee", "amount": 5.0},
+        headers=auth_headers,
+    ).json()
+    listed = client.get("/expenses/", headers=auth_headers)
+    single = client.get(f"/expenses/{created['id']}", headers=auth_headers)
+    etag = listed.headers["ETag"]
+    assert single.headers["ETag"] == etag
+
+    sql_statements.clear()
+    for url in ("/expenses/", f"/expenses/{created['id']}"):
+        response = client.get(
+            url, headers={**auth_headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+    assert sql_statements == []
+
+    # "*" matches only an expense that exists.
+    star = {**auth_headers, "If-None-Match": "*"}
+    response = client.get(f"/expenses/{created['id']}", headers=star)
+    assert response.status_code == 304
+    assert client.get("/expenses/999", headers=star).status_code == 404
+
+    client.put(
+        f"/expenses/{created['id']}",
+        json={"description": "Tea"},
+        headers=auth_headers,
+    )
+    response = client.get(
+        "/expenses/", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["description"] == "Tea"
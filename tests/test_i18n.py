@@ -0,0 +1,15 @@
+from app import i18n
+
+
+def test_translator_uses_shared_catalog():
+    assert i18n.get_translator("fa")("expense_not_found") == "هزینه یافت نشد"
+    assert i18n.get_translator("xx")("expense_not_found") == (
+        "Expense not found"
+    )
+    assert i18n.load_translations()["fa"] is i18n.load_translations()["fa"]
+
+
+def test_parse_accept_language():
+    assert i18n.parse_accept_language("fa-IR,fa;q=0.9,en;q=0.8") == "fa"
+    assert i18n.parse_accept_language("de-DE,en-US;q=0.7") == "en"
+    assert i18n.parse_accept_language("de") == i18n.DEFAULT_LANGUAGE
@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app import ingest
+from app.ingest import ingest_batch_size
+
+
+def test_group_commit_batches_concurrent_creates(
+    client, auth_headers, monkeypatch
+):
+    monkeypatch.setattr(ingest, "INGEST_GROUP_COMMIT", True)
+    monkeypatch.setattr(ingest.ingest_queue, "max_delay", 0.05)
+    batches_before = ingest_batch_size.count()
+
+    def create(i):
+        return client.post(
+            "/expenses/",
+            json={"description": f"Item {i}", "amount": i},
+            headers=auth_headers,
+        )
+
+    with client:
+        client.get("/expenses/999", headers=auth_headers)  # warm up
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(create, range(10)))
+
+    assert [r.status_code for r in responses] == [200] * 10
+    assert [r.json()["description"] for r in responses] == [
+        f"Item {i}" for i in range(10)
+    ]
+    assert len({r.json()["id"] for r in responses}) == 10
+    assert ingest_batch_size.count() - batches_before < 10
+
+    listed = client.get("/expenses/", headers=auth_headers).json()
+    assert len(listed) == 10
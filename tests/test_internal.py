@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import create_engine, exc
+
+from app import dependencies
+from app.pool import pool_options, pool_status
+
+
+def test_pool_stats_require_token(client, monkeypatch):
+    assert client.get("/internal/pool").status_code == 404
+
+    monkeypatch.setattr(dependencies, "INTERNAL_API_TOKEN", "s3cret")
+    response = client.get(
+        "/internal/pool", headers={"X-Internal-Token": "wrong"}
+    )
+    assert response.status_code == 403
+
+    response = client.get(
+        "/internal/pool", headers={"X-Internal-Token": "s3cret"}
+    )
+    assert response.status_code == 200
+    assert response.json()["sync"]["pool"] == "InstrumentedQueuePool"
+    assert "wait_seconds_max" in response.json()["async"]
+
+
+def test_pool_counts_overflow_and_timeouts(tmp_path):
+    url = f"sqlite:///{tmp_path}/pool.db"
+    engine = create_engine(
+        url,
+        **pool_options(
+            url,
+            size=1,
+            max_overflow=1,
+            timeout=0.01,
+            recycle=-1,
+            pre_ping=False,
+        ),
+    )
+    first, second = engine.connect(), engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    status = pool_status(engine)
+    assert status["checked_out"] == 2
+    assert status["overflow"] == 1
+    assert status["checkouts"] == 2
+    assert status["overflow_checkouts"] == 1
+    assert status["timeouts"] == 1
+
+    first.close()
+    second.close()
+    engine.dispose()
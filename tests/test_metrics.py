@@ -0,0 +1,38 @@
+from app import dependencies
+from app.metrics import Histogram, Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.register(
+        Histogram("latency_seconds", "Latency.", ("route",), (0.1, 1.0))
+    )
+    latency.observe(0.05, "/a")
+    latency.observe(0.5, "/a")
+    latency.observe(5.0, "/a")
+
+    lines = registry.render().splitlines()
+    assert lines[1] == "# TYPE latency_seconds histogram"
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+
+
+def test_metrics_endpoint(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(dependencies, "INTERNAL_API_TOKEN", "s3cret")
+    client.get("/expenses/999", headers=auth_headers)
+    client.get("/expenses/", headers=auth_headers)
+
+    response = client.get(
+        "/metrics", headers={"Authorization": "Bearer s3cret"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert (
+        'http_requests_total{method="GET",route="/expenses/{expense_id}",'
+        'status="404"}' in body
+    )
+    assert 'cache_lookups_total{layer="redis",result="miss"}' in body
+    assert 'db_pool_connections{engine="sync",state="checked_in"}' in body
@@ -0,0 +1,30 @@
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import profiling
+
+
+def test_request_sql_profile(tmp_path, monkeypatch, caplog):
+    engine = create_engine(f"sqlite:///{tmp_path}/profile.db")
+    profiling.instrument_engine(engine, "test")
+    app = FastAPI()
+    app.add_middleware(profiling.ProfilingMiddleware, debug=True)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {"id": item_id}
+
+    monkeypatch.setattr(profiling, "SLOW_QUERY_THRESHOLD_MS", 1e-6)
+    with caplog.at_level(logging.WARNING, logger="app.profiling"):
+        response = TestClient(app).get("/items/1")
+
+    assert response.status_code == 200
+    assert 'desc="2 queries"' in response.headers["Server-Timing"]
+    assert "on /items/{item_id}: SELECT 2" in caplog.text
+    engine.dispose()
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from app import serialization
+
+
+def test_backends_encode_identically():
+    value = {
+        "description": "Café",
+        "amount": 5.5,
+        "created_at": datetime(2026, 10, 17, 9, 30, 0, 123456),
+        "tags": [1, None, True],
+    }
+    encoded = serialization.dumps(value)
+    assert encoded == serialization._stdlib_dumps(value)
+    assert serialization.loads(encoded)["created_at"] == (
+        "2026-10-17T09:30:00.123456"
+    )
@@ -0,0 +1,44 @@
+import asyncio
+import os
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import database
+from app.server import available_cpus, reset_after_fork
+
+
+def test_available_cpus_respects_cgroup_quota(tmp_path):
+    cores = len(os.sched_getaffinity(0))
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+    assert available_cpus(tmp_path) == min(cores, 2)
+
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert available_cpus(tmp_path) == cores
+
+
+def test_available_cpus_cgroup_v1(tmp_path):
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("50000\n")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+    assert available_cpus(tmp_path) == 1
+
+
+def test_reset_after_fork_leaves_engines_usable():
+    pool = database.engine.pool
+    reset_after_fork()
+    assert database.engine.pool is not pool
+
+    async def ping():
+        async with database.async_engine.connect() as conn:
+            return (await conn.exec_driver_sql("SELECT 1")).scalar()
+
+    assert asyncio.run(ping()) == 1
+    asyncio.run(database.async_engine.dispose())
+
+
+def test_reset_after_fork_resets_replica_pool(monkeypatch):
+    replica = create_async_engine("sqlite+aiosqlite://")
+    monkeypatch.setattr(database, "async_replica_engine", replica)
+    pool = replica.pool
+    reset_after_fork()
+    assert replica.pool is not pool
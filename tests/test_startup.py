@@ -0,0 +1,55 @@
+import asyncio
+
+import fakeredis
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import startup
+from app.hashing import PasswordHasher
+from app.main import app
+
+
+def test_warm_db_pool_leaves_connections_open(tmp_path):
+    async def warm():
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'warm.db'}", pool_size=3
+        )
+        try:
+            opened = await startup.warm_db_pool(engine, 5)
+            return opened, engine.pool.checkedin()
+        finally:
+            await engine.dispose()
+
+    # Capped at the pool size, and every connection is back in the pool.
+    assert asyncio.run(warm()) == (3, 3)
+
+
+def test_warm_redis_pool():
+    redis_client = fakeredis.FakeAsyncRedis()
+    assert asyncio.run(startup.warm_redis_pool(redis_client, 2)) == 2
+
+
+def test_lifespan_prebuilds_openapi_schema(client):
+    app.openapi_schema = None
+    with client:
+        assert app.openapi_schema is not None
+
+
+def test_password_hasher_start_spawns_light_workers():
+    hasher = PasswordHasher(workers=2, queue_size=0, retry_after=1)
+
+    async def start():
+        await hasher.start()
+        loop = asyncio.get_running_loop()
+        # A builtin, so unpickling it imports nothing in the worker.
+        return await loop.run_in_executor(
+            hasher._executor,
+            eval,
+            "'app.database' in __import__('sys').modules",
+        )
+
+    try:
+        app_imported = asyncio.run(start())
+        assert len(hasher._executor._processes) == 2
+    finally:
+        hasher.shutdown()
+    assert app_imported is False